@@ -4,7 +4,7 @@
 - Nombre: __init__.py (irencoder)
 - Descripción: contiene el enum 'EncodeTypes' (ver docstring).
 - Autor: Agustín González
-- Modificado: 29/05/18
+- Modificado: 16/10/26
 '''
 
 from enum import Enum
@@ -20,3 +20,11 @@ class EncodeTypes(Enum):
     BitPacking = 6
     Simple16 = 7
     PForDelta = 8
+    PartitionedEliasFano = 9
+    Simple8b = 10
+    GroupVarint = 11
+    StreamVByte = 12
+    EliasDelta = 13
+    EliasOmega = 14
+    Rice = 15
+    Interpolative = 16
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+- Nombre: batch.py
+- Descripción: permite encode/decode de múltiples listas de enteros en
+paralelo, mediante un pool de procesos (ver encode_many y decode_many).
+- Autor: Agustín González
+- Modificado: 16/10/26
+
+Funcionamiento básico: las listas se agrupan en lotes (chunks) contiguos de
+tamaño similar (según su cantidad de números), y cada lote se codifica o
+decodifica en un proceso del pool con listcodec (ver listcodec.py). Agrupar
+las listas reduce la cantidad de tareas y, con ello, el costo de serialización
+(pickling) y de comunicación entre procesos por lista. Los resultados se
+retornan en el mismo orden que las listas recibidas. Si la cantidad total de
+números es menor a MIN_PARALLEL_NUMBERS (o si se indica un único proceso), se
+procesa todo en el proceso actual, ya que el costo de iniciar el pool supera
+al de la propia codificación.
+'''
+
+import multiprocessing
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    # Python 2 (sin concurrent.futures): procesamiento en el proceso actual.
+    ProcessPoolExecutor = None
+
+try:
+    # Relative import.
+    from . import EncodeTypes
+    from . import listcodec
+except:
+    # Import para ejecución 'directa' del script.
+    import time
+    from __init__ import EncodeTypes
+    import listcodec
+
+# Cantidad total de números a partir de la cual se utiliza el pool.
+MIN_PARALLEL_NUMBERS = 1 << 16
+
+# Cantidad de lotes por proceso: más de uno, para equilibrar la carga cuando
+# los lotes no demoran lo mismo.
+CHUNKS_PER_WORKER = 4
+
+
+def __chunks(items, sizes, chunks_count):
+    '''Agrupa los elementos en lotes contiguos, de modo que la suma de tamaños
+    de cada lote sea similar.
+
+    Args:
+        items (list): elementos a agrupar.
+        sizes (int list): tamaño de cada elemento.
+        chunks_count (int): cantidad de lotes deseada.
+
+    Returns:
+        chunks (generator): lotes (listas de elementos), en orden.
+    '''
+    # Tamaño objetivo de cada lote (al menos 1).
+    target = max(sum(sizes) // chunks_count, 1)
+
+    start = 0
+    size = 0
+    for i in range(0, len(items)):
+        size += sizes[i]
+        if size >= target:
+            yield items[start:i+1]
+            start = i + 1
+            size = 0
+
+    if start < len(items):
+        yield items[start:]
+
+
+def __encode_chunk(args):
+    '''Codifica un lote de listas (función ejecutada en cada proceso).
+
+    Args:
+        args (tuple): lote de listas y códec.
+
+    Returns:
+        encoded (bytearray list): listas codificadas.
+    '''
+    lists, codec = args
+    return [listcodec.encode(numbers, codec) for numbers in lists]
+
+
+def __decode_chunk(args):
+    '''Decodifica un lote de listas (función ejecutada en cada proceso).
+
+    Args:
+        args (tuple): lote de pares (codificación, cantidad) y códec.
+
+    Returns:
+        decoded (int list list): listas decodificadas.
+    '''
+    pairs, codec = args
+    return [listcodec.decode(encoded, nums, codec) for encoded, nums in pairs]
+
+
+def __pool_workers(sizes, workers):
+    '''Determina la cantidad de procesos a utilizar.
+
+    Args:
+        sizes (int list): cantidad de números de cada lista.
+        workers (int): cantidad de procesos solicitada. Si es None, la
+            cantidad de CPUs.
+
+    Returns:
+        workers (int): cantidad de procesos del pool, o 0 (cero) si se debe
+            procesar en el proceso actual.
+    '''
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    if ProcessPoolExecutor is None or workers <= 1 or \
+            sum(sizes) < MIN_PARALLEL_NUMBERS:
+        return 0
+
+    return workers
+
+
+def __map(function, items, sizes, codec, workers):
+    '''Aplica la función de lote dada sobre los elementos, agrupados en
+    lotes, en un pool de procesos.
+
+    Args:
+        function (function): función de lote (__encode_chunk o
+            __decode_chunk).
+        items (list): elementos a procesar.
+        sizes (int list): cantidad de números de cada elemento.
+        codec (EncodeTypes): códec a utilizar.
+        workers (int): cantidad de procesos.
+
+    Returns:
+        results (list): resultado de cada elemento, en orden.
+    '''
+    chunks = __chunks(items, sizes, workers * CHUNKS_PER_WORKER)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map retorna los resultados en el orden de los lotes.
+        for chunk_results in executor.map(function,
+                                          [(chunk, codec)
+                                           for chunk in chunks]):
+            results.extend(chunk_results)
+
+    return results
+
+
+def encode_many(lists, codec, workers=None):
+    '''Codifica múltiples listas de números con el códec dado.
+
+    Args:
+        lists (int list list): listas a codificar.
+        codec (EncodeTypes): códec a utilizar (ver listcodec.py).
+        workers (int): cantidad de procesos. Por omisión (None), la cantidad
+            de CPUs.
+
+    Returns:
+        encoded (bytearray list): listas codificadas, en el orden recibido.
+    '''
+    lists = list(lists)
+    sizes = [len(numbers) for numbers in lists]
+
+    workers = __pool_workers(sizes, workers)
+    if not workers:
+        return __encode_chunk((lists, codec))
+
+    return __map(__encode_chunk, lists, sizes, codec, workers)
+
+
+def decode_many(buffers, counts, codec, workers=None):
+    '''Decodifica múltiples listas codificadas con el códec dado.
+
+    Args:
+        buffers (bytes list): listas codificadas (ver listcodec.encode), en
+            cualquier iterable.
+        counts (int list): cantidad de números de cada lista, en cualquier
+            iterable.
+        codec (EncodeTypes): códec utilizado en la codificación.
+        workers (int): cantidad de procesos. Por omisión (None), la cantidad
+            de CPUs.
+
+    Returns:
+        decoded (int list list): listas decodificadas, en el orden recibido.
+
+    Nota: si se utiliza el pool, las codificaciones que no pueden serializarse
+    (por ejemplo, vistas memoryview de un archivo mapeado en memoria) se
+    copian a bytes antes de enviarse a cada proceso.
+    '''
+    buffers = list(buffers)
+    sizes = list(counts)
+    if len(buffers) != len(sizes):
+        raise Exception("Cantidad de codificaciones y de listas distinta.")
+
+    pairs = list(zip(buffers, sizes))
+
+    workers = __pool_workers(sizes, workers)
+    if not workers:
+        return __decode_chunk((pairs, codec))
+
+    pairs = [(encoded if isinstance(encoded, (bytes, bytearray))
+              else bytes(encoded), nums) for encoded, nums in pairs]
+    return __map(__decode_chunk, pairs, sizes, codec, workers)
+
+
+def main():
+    '''Prueba de funcionamiento de las funciones encode_many y decode_many.'''
+    print("Prueba de encode/decode de 10.000 listas en curso...")
+    lists = [list(range(term, term + 3000, 3)) for term in range(0, 10000)]
+    codec = EncodeTypes.PartitionedEliasFano
+
+    for workers in (1, None):
+        # Encode
+        start = time.time()
+        encoded = encode_many(lists, codec, workers)
+        end = time.time()
+        encoded_time = end-start
+
+        # Decode
+        start = time.time()
+        decoded = decode_many(encoded, [len(x) for x in lists], codec,
+                              workers)
+        end = time.time()
+        decoded_time = end-start
+
+        if lists != decoded:
+            print("ATENCIÓN: lists != decoded.")
+            return
+
+        print("Workers: {0}".format(workers or multiprocessing.cpu_count()))
+        print("Encoded time: {0}".format(encoded_time))
+        print("Decoded time: {0}".format(decoded_time))
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,13 @@
 # -*- coding: utf-8 -*-
 '''
 - Nombre: __init__.py (bitbytearray)
-- Descripción: contiene la clase 'BitByteArray' (ver docstring).
+- Descripción: contiene la clase 'BitByteArray' (ver docstring). Ver también
+la clase 'BitWriter' (bitwriter.py), para escrituras secuenciales de bits.
 - Autor: Agustín González
-- Modificado: 16/04/18
+- Modificado: 16/10/26
 '''
 from . import bitbyteutils as bbutils
+from .bitwriter import BitWriter
 
 
 class BitByteArray(object):
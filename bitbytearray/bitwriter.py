@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+- Nombre: bitwriter.py
+- Descripción: contiene la clase 'BitWriter' (ver docstring).
+- Autor: Agustín González
+- Modificado: 16/10/26
+'''
+
+import struct
+
+# Tamaño (en bits) de la palabra volcada al array en cada escritura.
+WORD_SIZE = 64
+
+# Tamaño (en bytes) de la palabra.
+WORD_BYTES = WORD_SIZE >> 3
+
+# Formato struct de la palabra (entero sin signo big-endian de 64 bits).
+WORD_FORMAT = ">Q"
+
+
+class BitWriter(object):
+    '''Permite la escritura secuencial de bits en un array de bytes. A diferencia
+    de 'BitByteArray', los bits se acumulan en un entero (acumulador) que se
+    vuelca al array de a palabras completas de 64 bits, por lo que no se opera
+    byte a byte en cada escritura.'''
+
+    def __init__(self, size=0):
+        '''Inicializa clase.
+
+        Args:
+            size (int): tamaño estimado (en bytes) de la escritura, utilizado
+                para reservar el array de antemano.
+        '''
+        # Array reservado (se duplica en caso de requerir más espacio).
+        self.__stream = bytearray(max(size, WORD_BYTES))
+
+        # Pointer de byte del array (próximo byte a escribir).
+        self.__byte_pointer = 0
+
+        # Acumulador de bits aún no volcados al array.
+        self.__accumulator = 0
+
+        # Cantidad de bits del acumulador.
+        self.__accumulated = 0
+
+    def __len__(self):
+        '''Retorna la cantidad de bits escritos.
+
+        Returns:
+            len (int): cantidad de bits escritos.
+        '''
+        return (self.__byte_pointer << 3) + self.__accumulated
+
+    def __flush(self):
+        '''Vuelca las palabras completas del acumulador al array.'''
+        while self.__accumulated >= WORD_SIZE:
+            # Bits restantes en el acumulador luego de extraer la palabra.
+            remaining = self.__accumulated - WORD_SIZE
+            word = self.__accumulator >> remaining
+
+            # Reserva de espacio (duplicación del array).
+            end = self.__byte_pointer + WORD_BYTES
+            if end > len(self.__stream):
+                self.__stream.extend(bytearray(len(self.__stream)))
+
+            struct.pack_into(WORD_FORMAT, self.__stream, self.__byte_pointer,
+                             word)
+            self.__byte_pointer = end
+
+            # Eliminación de bits volcados.
+            self.__accumulator &= (1 << remaining) - 1
+            self.__accumulated = remaining
+
+    def write_bits(self, value, bits):
+        '''Escribe los 'bits' bits bajos del número dado.
+
+        Args:
+            value (int): número a escribir. Nota: no debe exceder 'bits' bits.
+            bits (int): cant. de bits a escribir. Si el nro. se puede representar
+                con menos de la cantidad especificada, se rellenará con ceros.
+        '''
+        self.__accumulator = (self.__accumulator << bits) | value
+        self.__accumulated += bits
+
+        if self.__accumulated >= WORD_SIZE:
+            self.__flush()
+
+    def write_unary(self, number):
+        '''Escribe un número en unario (no optimizado): 'number' 1s seguidos de
+        un 0 (cero) terminador.
+
+        Args:
+            number (int): número a escribir.
+        '''
+        # Nota: ((1 << n) - 1) << 1 son n 1s seguidos de un 0.
+        self.write_bits(((1 << number) - 1) << 1, number + 1)
+
+    def padding(self):
+        '''Retorna el tamaño de relleno del último byte escrito.
+
+        Returns:
+            padding (int): bits de relleno del último byte.
+        '''
+        return (8 - (self.__accumulated & 7)) & 7
+
+    def to_bytearray(self):
+        '''Retorna los bits escritos como array de bytes (el último byte se
+        completa con ceros, según padding). El writer puede seguir utilizándose
+        luego de la invocación.
+
+        Returns:
+            array (bytearray): bytes escritos.
+        '''
+        encoded = self.__stream[:self.__byte_pointer]
+
+        # Bytes del acumulador (con relleno a derecha).
+        padding = self.padding()
+        tail_bytes = (self.__accumulated + padding) >> 3
+        tail = self.__accumulator << padding
+        for i in reversed(range(0, tail_bytes)):
+            encoded.append((tail >> (i << 3)) & 0xFF)
+
+        return encoded
@@ -4,22 +4,53 @@
 - Nombre: bitpackingencoder.py
 - Descripción: permite encode/decode de enteros a/desde paquetes de bits.
 - Autor: Agustín González
-- Modificado: 17/04/18
+- Modificado: 16/10/26
 '''
 
 import time
 import math
+import struct
 
 try:
     # Relative import.
     from . import vbencoder
+    from . import gapsencoder as gapsenc
     from . import unaryencoder as ue
     from .bitutils import write_binary_in_barray, read_binary_from_barray
+    from .bitutils import np_byte_view
+    from .bitbytearray import BitWriter
 except:
     # Import para ejecución 'directa' del script.
     import vbencoder
+    import gapsencoder as gapsenc
     import unaryencoder as ue
     from bitutils import read_binary_from_barray, write_binary_in_barray
+    from bitutils import np_byte_view
+    from bitbytearray import BitWriter
+
+try:
+    # NumPy es opcional: permite la decodificación vectorizada (ver decode).
+    import numpy as np
+except ImportError:
+    np = None
+
+# Máximo b soportado por la decodificación vectorizada: un número de b bits
+# que comienza en el bit k de un byte (k<=7) debe caber en una ventana de 64.
+NP_MAX_B = 57
+
+# Cantidad de números por bloque (modo en bloques, ver encode_blocks).
+BLOCK_SIZE = 128
+
+# Formatos struct de cada entrada de la tabla de bloques, según se utilice
+# frame of reference (b, base, offset) o no (b, offset).
+BLOCK_ENTRY_FORMATS = {False: ">BI", True: ">BII"}
+
+# Tamaño (en bytes) de cada entrada de la tabla de bloques.
+BLOCK_ENTRY_SIZES = {k: struct.calcsize(v)
+                     for k, v in BLOCK_ENTRY_FORMATS.items()}
+
+# Máximo valor de base y de offset de la tabla de bloques (32 bits).
+MAX_BLOCK_FIELD = (1 << 32) - 1
 
 
 def compute_encoded_size(numbers):
@@ -89,26 +120,272 @@ def encode(numbers):
     return encoded, padding
 
 
-def decode(encoded, nums):
+def __np_decode(encoded, nums, b, offset, base=0, prefix_base=None):
+    '''Decodifica una secuencia de paquetes de bits utilizando NumPy: todos los
+    números se leen en una única operación sobre una vista de enteros de 64
+    bits (big-endian) del buffer.
+
+    Args:
+        encoded (bytes): números a decodificar.
+        nums (int): cantidad de números a decodificar.
+        b (int): bits utilizados por número.
+        offset (int): nro. de bit de inicio de lectura (múltiplo de 8).
+        base (int): número a sumar a cada número decodificado.
+        prefix_base (int): si no es None, se retorna la suma acumulada de los
+            números decodificados desde prefix_base (ver
+            gapsencoder.prefix_sum), calculada sobre el array.
+
+    Returns:
+        decoded (int list): números decodificados.
+    '''
+    if nums <= 0:
+        return []
+
+    # Bytes de datos a leer. Nota: n >> 3 = int(n / 8)
+    start = offset >> 3
+    data_size = ((nums*b) + 7) >> 3
+
+    # Copia de datos (desde una vista de encoded, sin copia intermedia) con 8
+    # bytes de relleno, para que la lectura de 64 bits desde cualquier byte de
+    # datos no exceda el tamaño del buffer.
+    data = np.zeros(data_size + 8, dtype=np.uint8)
+    data[:data_size] = np_byte_view(encoded, start, data_size)
+
+    # Vista de enteros de 64 bits big-endian con paso de 1 byte: el i-ésimo
+    # elemento de la vista son los 8 bytes que comienzan en data[i].
+    words = np.ndarray(shape=(data_size+1,), dtype='>u8', buffer=data,
+                       strides=(1,))
+
+    # Bit de inicio de cada número.
+    bit_offsets = np.arange(nums, dtype=np.uint64) * np.uint64(b)
+
+    # Palabra que contiene a cada número (byte index = offset >> 3).
+    selected = words[(bit_offsets >> np.uint64(3)).astype(np.intp)]
+
+    # Shift según bit index (offset & 7) y eliminación de bits excedentes.
+    shifts = np.uint64(64 - b) - (bit_offsets & np.uint64(7))
+    decoded = (selected >> shifts) & np.uint64((1 << b)-1)
+
+    if base:
+        decoded += np.uint64(base)
+
+    if prefix_base is not None:
+        return gapsenc.prefix_sum(decoded, prefix_base)
+
+    return decoded.tolist()
+
+
+def __unpack(encoded, nums, b, offset, base=0, prefix_base=None):
+    '''Lee 'nums' números de b bits desde el offset dado (con NumPy, si está
+    disponible).
+
+    Args:
+        encoded (bytes): números a decodificar.
+        nums (int): cantidad de números a decodificar.
+        b (int): bits utilizados por número.
+        offset (int): nro. de bit de inicio de lectura.
+        base (int): número a sumar a cada número decodificado.
+        prefix_base (int): si no es None, se retorna la suma acumulada de los
+            números decodificados desde prefix_base.
+
+    Returns:
+        decoded (int list): números decodificados.
+    '''
+    # Si NumPy está disponible (y el offset es múltiplo de 8), decodificación
+    # 'en lote'.
+    if np is not None and 0 < b <= NP_MAX_B and not offset & 7:
+        return __np_decode(encoded, nums, b, offset, base, prefix_base)
+
+    # Si b es 0 (cero), todos los números son iguales a base.
+    if b == 0:
+        decoded = [base] * nums
+    else:
+        decoded = [read_binary_from_barray(encoded, offset+(i*b), b) + base
+                   for i in range(0, nums)]
+
+    if prefix_base is not None:
+        return gapsenc.prefix_sum(decoded, prefix_base)
+
+    return decoded
+
+
+def decode(encoded, nums, offset=0, prefix_sum=False, base=0):
     '''Decodifica una secuencia de paquetes de bits.
 
     Args:
         encoded (bytes): números a decodificar.
         nums (int): cantidad de números a decodificar.
+        offset (int): nro. de bit de inicio de lectura.
+        prefix_sum (bool): indica si los números decodificados son gaps, en
+            cuyo caso se retorna su suma acumulada desde base (ver
+            gapsencoder.prefix_sum). Por omisión, en False.
+        base (int): número desde el que se acumulan los gaps.
 
     Returns:
         number (int): números decodificados.
 
     Nota: no es necesario padding, ya que el parámetro 'nums' indica cuántos
-    números deben decodificarse.
+    números deben decodificarse. Si NumPy está instalado, se utiliza una
+    decodificación vectorizada (ver __np_decode), con idéntico resultado.
     '''
-    b, offset = vbencoder.decode_number(encoded)
+    b, offset = vbencoder.decode_number(encoded, offset)
 
     # Add de 1 eliminado en b.
     b += 1
 
-    # Decoded
-    decoded = [read_binary_from_barray(encoded, offset+(i*b), b) for i in range(0, nums)]
+    return __unpack(encoded, nums, b, offset,
+                    prefix_base=base if prefix_sum else None)
+
+
+def encode_blocks(numbers, frame_of_reference=True):
+    '''Codifica una lista de números como paquetes de bits, en bloques de
+    BLOCK_SIZE números. Cada bloque utiliza su propio b (según el máximo del
+    bloque) y, opcionalmente, un frame of reference (base): el mínimo del
+    bloque, que se resta a cada número antes de la codificación.
+
+    Formato: [flags] + [tabla de bloques] + [bloques], donde flags (1 byte)
+    indica si se utiliza frame of reference y la tabla contiene, por cada
+    bloque, una entrada de tamaño fijo (ver BLOCK_ENTRY_FORMATS) con b, base
+    (opcional) y offset (en bytes) del bloque relativo al inicio de los datos.
+    Cada bloque inicia en un byte 'completo', por lo que cualquiera de ellos
+    puede ubicarse y decodificarse por sí mismo (ver decode_block). La base
+    y el offset de cada bloque se almacenan en 32 bits: si alguno excede
+    MAX_BLOCK_FIELD, se lanza una excepción.
+
+    Args:
+        numbers (int list): números a codificar.
+        frame_of_reference (bool): en True (por omisión), indica que se debe
+            almacenar el mínimo de cada bloque como base.
+
+    Returns
+        encoded (bytearray): números codificados.
+    '''
+    frame_of_reference = bool(frame_of_reference)
+    entry_format = BLOCK_ENTRY_FORMATS[frame_of_reference]
+    entry_size = BLOCK_ENTRY_SIZES[frame_of_reference]
+
+    blocks_count = (len(numbers) + BLOCK_SIZE - 1) // BLOCK_SIZE
+
+    # Header: flags y tabla de bloques (se completa a medida que se codifica).
+    header = bytearray(1 + blocks_count*entry_size)
+    header[0] = int(frame_of_reference)
+
+    writer = BitWriter(len(numbers) << 2)
+
+    for block in range(0, blocks_count):
+        block_numbers = numbers[block*BLOCK_SIZE:(block+1)*BLOCK_SIZE]
+
+        base = min(block_numbers) if frame_of_reference else 0
+
+        # Bits utilizados por número en el bloque.
+        b = (max(block_numbers) - base).bit_length()
+
+        # Offset (en bytes) del bloque. Nota: n >> 3 = int(n / 8)
+        block_offset = len(writer) >> 3
+
+        if base > MAX_BLOCK_FIELD or block_offset > MAX_BLOCK_FIELD:
+            ex = "Base u offset de bloque mayor a 32 bits (bloque {0})."
+            raise Exception(ex.format(block))
+
+        if frame_of_reference:
+            entry = (b, base, block_offset)
+        else:
+            entry = (b, block_offset)
+        struct.pack_into(entry_format, header, 1 + block*entry_size, *entry)
+
+        for number in block_numbers:
+            writer.write_bits(number - base, b)
+
+        # Relleno para que el siguiente bloque inicie en un nuevo byte.
+        writer.write_bits(0, writer.padding())
+
+    return header + writer.to_bytearray()
+
+
+def __get_block_header(encoded, blocks_count, block, offset=0):
+    '''Retorna la entrada de la tabla de bloques del bloque especificado.
+
+    Args:
+        encoded (bytes): números codificados (ver encode_blocks).
+        blocks_count (int): cantidad de bloques de la codificación.
+        block (int): índice de bloque.
+        offset (int): nro. de bit de inicio de la codificación (múltiplo de
+            8).
+
+    Returns:
+        b (int): bits utilizados por número en el bloque.
+        base (int): frame of reference del bloque (0, si no se utiliza).
+        offset (int): nro. de bit de inicio de los datos del bloque.
+    '''
+    # Nota: n >> 3 = int(n / 8)
+    start = offset >> 3
+
+    frame_of_reference = bool(encoded[start])
+    entry_format = BLOCK_ENTRY_FORMATS[frame_of_reference]
+    entry_size = BLOCK_ENTRY_SIZES[frame_of_reference]
+
+    # Inicio de los datos (luego de flags y tabla de bloques).
+    data_start = start + 1 + blocks_count*entry_size
+
+    entry_start = start + 1 + block*entry_size
+    entry = struct.unpack_from(entry_format, encoded, entry_start)
+
+    if frame_of_reference:
+        b, base, block_offset = entry
+    else:
+        b, block_offset = entry
+        base = 0
+
+    # Nota: n << 3 = n * 8
+    return b, base, (data_start + block_offset) << 3
+
+
+def decode_block(encoded, nums, block, offset=0):
+    '''Decodifica un único bloque de una codificación en bloques, sin
+    decodificar los anteriores.
+
+    Args:
+        encoded (bytes): números codificados (ver encode_blocks).
+        nums (int): cantidad total de números de la codificación.
+        block (int): índice de bloque a decodificar.
+        offset (int): nro. de bit de inicio de la codificación (múltiplo de
+            8).
+
+    Returns:
+        decoded (int list): números decodificados del bloque.
+    '''
+    blocks_count = (nums + BLOCK_SIZE - 1) // BLOCK_SIZE
+    b, base, offset = __get_block_header(encoded, blocks_count, block, offset)
+
+    # Cantidad de números del bloque (el último puede estar incompleto).
+    block_nums = min(BLOCK_SIZE, nums - block*BLOCK_SIZE)
+
+    return __unpack(encoded, block_nums, b, offset, base)
+
+
+def decode_blocks(encoded, nums, offset=0, first=0, last=None):
+    '''Decodifica un rango de bloques de una codificación en bloques.
+
+    Args:
+        encoded (bytes): números codificados (ver encode_blocks).
+        nums (int): cantidad total de números de la codificación.
+        offset (int): nro. de bit de inicio de la codificación (múltiplo de
+            8).
+        first (int): índice del primer bloque a decodificar.
+        last (int): índice del último bloque a decodificar (inclusive). Por
+            omisión, el último bloque de la codificación.
+
+    Returns:
+        decoded (int list): números decodificados.
+    '''
+    blocks_count = (nums + BLOCK_SIZE - 1) // BLOCK_SIZE
+    if last is None:
+        last = blocks_count - 1
+
+    decoded = []
+    for block in range(first, last+1):
+        decoded.extend(decode_block(encoded, nums, block, offset))
+
     return decoded
 
 
@@ -9,9 +9,15 @@ desarrollado una 'única' función (parametrizada, según se trate de escribir o
 leer un byte o un entero), ya que esto implicaría añadir complejidad a una
 sección 'crítica' de código y, con ello, pérdida de rendimiento.
 - Autor: Agustín González
-- Modificado: 26/04/18
+- Modificado: 16/10/26
 '''
 
+try:
+    # NumPy es opcional (ver np_byte_view).
+    import numpy as np
+except ImportError:
+    np = None
+
 
 def write_binary_in_iarray(array, offset, number, bits):
     '''Permite la escritura binaria en un array de ints desde el offset dado.
@@ -244,3 +250,25 @@ def read_binary_from_barray(array, offset, bits):
         bits -= to_read
 
     return number
+
+
+def np_byte_view(array, start=0, count=-1):
+    '''Retorna los bytes del array dado como ndarray de NumPy (uint8). Si el
+    array implementa el protocolo buffer (bytes, bytearray, memoryview, mmap),
+    el ndarray es una vista de solo lectura de sus bytes (sin copia). En otro
+    caso (por ejemplo, una lista de enteros), se copian los bytes a leer.
+
+    Args:
+        array (byte list): array de bytes.
+        start (int): índice del primer byte.
+        count (int): cantidad de bytes. Por omisión (-1), hasta el final del
+            array.
+
+    Returns:
+        view (ndarray): bytes del array.
+    '''
+    try:
+        return np.frombuffer(array, dtype=np.uint8, count=count, offset=start)
+    except TypeError:
+        end = len(array) if count < 0 else start + count
+        return np.array(array[start:end], dtype=np.uint8)
@@ -8,13 +8,14 @@ codificación, se comprime una secuencia de gaps correspondiente a una lista
 creciente de 1 millón de enteros y luego se mide el tiempo de descompresión de
 c/u. Dado que EF comprime la lista original usando delta encode internamente,
 para equiparar, el tiempo de decodificación de gaps se añade en las restantes
-mediciones. Esta operación se realiza 5 veces, aunque también se realiza una
-inicial (a modo de 'warm-up'), que no se toma en cuenta para el promedio final.
+mediciones (mediante el parámetro prefix_sum de cada decode). Esta operación
+se realiza 5 veces, aunque también se realiza una inicial (a modo de
+'warm-up'), que no se toma en cuenta para el promedio final.
 Además, por cada repetición, la distancia entre números se duplica. Es decir,
 en la 1era iteración (pertinente a la medición), se prueba la secuencia
 S=[1, 2, 3], en la 2da S=[1, 3, 5], en la 3era S=[1, 5, 9] y así sucesivamente.
 - Autor: Agustín González
-- Modificado: 02/06/17
+- Modificado: 16/10/26
 '''
 
 import sys
@@ -28,7 +29,6 @@ import gapsencoder as gapsenc
 import eliasfanoencoder as efenc
 import simple16encoder as s16enc
 import bitpackingencoder as bpenc
-from bitbytearray import BitByteArray
 
 
 NUMBERS_COUNT = 1000000
@@ -66,47 +66,43 @@ def main():
         # Bit packing test.
         encode = bpenc.encode(numbers)[0]
         start = time.time()
-        gapsenc.decode(bpenc.decode(encode, NUMBERS_COUNT))
+        bpenc.decode(encode, NUMBERS_COUNT, prefix_sum=True)
         end = time.time()
         bptime = end - start
 
         # PFD test.
         encode = pfdenc.encode(numbers)
         start = time.time()
-        gapsenc.decode(pfdenc.decode(encode, NUMBERS_COUNT))
+        pfdenc.decode(encode, NUMBERS_COUNT, prefix_sum=True)
         end = time.time()
         pfdtime = end - start
 
         # S16 test.
         encode = s16enc.encode(numbers)
         start = time.time()
-        gapsenc.decode(s16enc.decode(encode, NUMBERS_COUNT))
+        s16enc.decode(encode, NUMBERS_COUNT, prefix_sum=True)
         end = time.time()
         s16time = end - start
 
         # VB test.
-        for n in numbers:
-            encode.extend(vbenc.encode(n))
+        encode = vbenc.encode_list(numbers)
         start = time.time()
-        gapsenc.decode(vbenc.decode(encode))
+        vbenc.decode(encode, NUMBERS_COUNT, prefix_sum=True)
         end = time.time()
         vbtime = end - start
 
         # Unary test.
-        encode = BitByteArray()
-        for n in numbers:
-            encode.extend(unenc.encode(n, optimize=True)[0])
+        encode = unenc.encode_list(numbers, optimize=True)[0]
         start = time.time()
-        gapsenc.decode(unenc.decode(encode, NUMBERS_COUNT, is_optimized=True))
+        unenc.decode(encode, NUMBERS_COUNT, is_optimized=True,
+                     prefix_sum=True)
         end = time.time()
         unarytime = end - start
 
         # Gamma test.
-        encode = BitByteArray()
-        for n in numbers:
-            encode.extend(gaenc.encode(n)[0])
+        encode = gaenc.encode_list(numbers)[0]
         start = time.time()
-        gapsenc.decode(gaenc.decode(encode, NUMBERS_COUNT))
+        gaenc.decode(encode, NUMBERS_COUNT, prefix_sum=True)
         end = time.time()
         gammatime = end - start
 
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+- Nombre: eliasdeltaencoder.py
+- Descripción: permite encode/decode de enteros a/desde Elias Delta.
+- Autor: Agustín González
+- Modificado: 16/10/26
+
+Funcionamiento básico: dado un número n (n > 0) de L bits, se codifica L en
+Gamma (ver gammaencoder.py) seguido de los L-1 bits bajos de n (sin su bit más
+significativo). El tamaño del código es de 2*floor(log2(L)) + L bits, por lo
+que, a diferencia de Gamma (2*floor(log2(n)) + 1 bits), resulta conveniente
+para números grandes (por ejemplo, gaps de términos poco frecuentes).
+'''
+
+try:
+    # Relative import.
+    from . import bitbytearray as bbarray
+    from . import gammaencoder as gaenc
+    from . import bitutils
+except:
+    # Import para ejecución 'directa' del script.
+    import time
+    import bitutils
+    import gammaencoder as gaenc
+    import bitbytearray as bbarray
+
+# Tamaño (en bits) de la ventana de lectura de la tabla de decodificación.
+WINDOW_SIZE = 16
+
+
+def __code(number):
+    '''Retorna el código Elias Delta de un número.
+
+    Args:
+        number (int): número a codificar (mayor a 0).
+
+    Returns:
+        code (int): código (como entero).
+        size (int): tamaño del código en bits.
+    '''
+    length = number.bit_length()
+
+    # 1. Gamma de length: unario de size seguido de length sin su bit más
+    # significativo (ver gammaencoder.encode_list).
+    size = length.bit_length() - 1
+    code = (((1 << size) - 1) << (size + 1)) | (length ^ (1 << size))
+
+    # 2. Número sin su bit más significativo.
+    code = (code << (length - 1)) | (number ^ (1 << (length - 1)))
+
+    return code, (size << 1) + length
+
+
+def __build_decode_table():
+    '''Construye la tabla de decodificación de ventanas de WINDOW_SIZE bits
+    (ver gammaencoder.DECODE_TABLE): para cada posible ventana cuyo prefijo
+    sea un código Elias Delta completo, la entrada contiene el número
+    decodificado y el tamaño (en bits) del código.
+
+    Returns:
+        table (tuple list): tabla de 2^WINDOW_SIZE entradas.
+    '''
+    table = [None] * (1 << WINDOW_SIZE)
+
+    # Números cuyo código entra en la ventana (el tamaño del código crece
+    # con el número, por lo que se finaliza en el primero que la excede).
+    for number in range(1, 1 << WINDOW_SIZE):
+        code, code_size = __code(number)
+        if code_size > WINDOW_SIZE:
+            break
+
+        # Todas las ventanas con el código como prefijo.
+        free_bits = WINDOW_SIZE - code_size
+        start = code << free_bits
+        table[start:start + (1 << free_bits)] = \
+            [(number, code_size)] * (1 << free_bits)
+
+    return table
+
+
+# Tabla de decodificación por ventanas (ver __build_decode_table).
+DECODE_TABLE = __build_decode_table()
+
+
+def compute_encoded_size(numbers):
+    '''Calcula el tamaño de codificación final de la lista dada.
+
+    Args:
+        numbers (int list): números a codificar.
+
+    Returns:
+        size (int): tamaño de codificación final en bits.
+    '''
+    size = 0
+    for number in numbers:
+        length = number.bit_length()
+        # Nota: (bit_length - 1) << 1 = floor(log2(n)) * 2
+        size += ((length.bit_length() - 1) << 1) + length
+    return size
+
+
+def encode(number):
+    '''Codifica un entero a Elias Delta.
+
+    Args:
+        number (int): número a codificar.
+
+    Returns:
+        encoded (byte list): número codificado como array de bytes.
+        padding (int): relleno (en bits) del último byte de la codificación.
+    '''
+    return encode_list([number])
+
+
+def encode_list(numbers):
+    '''Codifica una lista de enteros a Elias Delta sobre un único array de
+    bits.
+
+    Args:
+        numbers (int list): números a codificar.
+
+    Returns:
+        encoded (bytearray): números codificados.
+        padding (int): relleno (en bits) del último byte de la codificación.
+    '''
+    if 0 in numbers:
+        ex = "No es posible representar el 0 (cero) en Elias Delta."
+        raise Exception(ex)
+
+    # Nota: (n + 7) >> 3 = techo(n/8)
+    writer = bbarray.BitWriter((compute_encoded_size(numbers) + 7) >> 3)
+
+    for number in numbers:
+        code, size = __code(number)
+        writer.write_bits(code, size)
+
+    return writer.to_bytearray(), writer.padding()
+
+
+def decode(encoded, nums, offset=0):
+    '''Decodifica una secuencia de bytes codificada en Elias Delta. Cada número
+    se obtiene con una única búsqueda en DECODE_TABLE, según la ventana de
+    bits que comienza en el offset actual. Sólo los códigos que exceden la
+    ventana (y los últimos bytes del array) se leen mediante Gamma + binario.
+
+    Args:
+        encoded (byte list): números codificados.
+        nums (int): cantidad de números a decodificar.
+        offset (int): nro. de bit de inicio de lectura.
+
+    Returns:
+        decoded (int list): números decodificados.
+    '''
+    decoded = []
+
+    # Último byte index desde el que es posible leer una ventana (3 bytes).
+    last_window_index = len(encoded) - 3
+
+    for _ in range(0, nums):
+        byte_index = offset >> 3
+
+        if byte_index <= last_window_index:
+            # Ventana de WINDOW_SIZE bits desde el offset. Nota: n & 7 = n % 8
+            window = ((encoded[byte_index] << 16) +
+                      (encoded[byte_index+1] << 8) +
+                      encoded[byte_index+2]) >> (8 - (offset & 7))
+            entry = DECODE_TABLE[window & 0xFFFF]
+
+            if entry is not None:
+                decoded.append(entry[0])
+                offset += entry[1]
+                continue
+
+        # 1. Lectura Gamma de la cantidad de bits del número.
+        length = gaenc.decode(encoded, 1, offset)[0]
+        offset += ((length.bit_length() - 1) << 1) + 1
+
+        # 2. Lectura binaria y add de bit más significativo.
+        number = bitutils.read_binary_from_barray(encoded, offset, length - 1)
+        decoded.append(number + (1 << (length - 1)))
+
+        # Incremento de offset según bits leídos.
+        offset += length - 1
+
+    return decoded
+
+
+def main():
+    '''Prueba de funcionamiento de las funciones encode y decode.'''
+    print("Prueba de encode/decode de 1 millón de enteros en curso...")
+    numbers = [7, 3, 1000, 1 << 20] * 250000
+
+    # Encode
+    start = time.time()
+    encoded, _ = encode_list(numbers)
+    end = time.time()
+    encoded_time = end-start
+
+    # Decode
+    start = time.time()
+    decoded = decode(encoded, len(numbers))
+    end = time.time()
+    decoded_time = end-start
+
+    if numbers != decoded:
+        print(numbers[-5:], decoded[-5:])
+        print("ATENCIÓN: numbers != decoded.")
+        return
+
+    print("Encoded time: {0}".format(encoded_time))
+    print("Decoded time: {0}".format(decoded_time))
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,7 @@
 - Nombre: eliasfanoencoder.py
 - Descripción: permite encode/decode de enteros a/desde Elias Fano.
 - Autor: Agustín González
-- Modificado: 22/04/18
+- Modificado: 16/10/26
 
 Breve reseña sobre Elias Fano (EF): dada N una lista creciente de números y
 siendo u=max(N), N se subdivide en otras dos listas: U y L. Mientras que, en
@@ -20,7 +20,8 @@ decodificar la totalidad de bits superiores y, en otro ciclo, los inferiores.
 
 EF Multinivel: en el paper "Partitioned Elias-Fano Indexes" de Ottaviano
 y Venturini (https://bit.ly/2qNiFDg), se propone una versión de Elias Fano
-de dos niveles para lograr un mejor rate de compresión.
+de dos niveles para lograr un mejor rate de compresión (implementada en el
+módulo partitionedeliasfanoencoder.py).
 
 EF Local, una alternativa a EF Multinivel: dado que la implementación aquí
 presente se ha utilizado en la propuesta de un esquema de compresión múltiple,
@@ -38,6 +39,7 @@ se comprime con esta codificación).
 '''
 
 import math
+import bisect
 
 try:
     # Relative import.
@@ -45,7 +47,7 @@ try:
     from . import gapsencoder
     from . import unaryencoder
     from . import vbencoder as vbenc
-    from .bitbytearray import BitByteArray, bitbyteutils as bbutils
+    from .bitbytearray import BitWriter, bitbyteutils as bbutils
 except:
     # Import para ejecución 'directa' del script.
     import time
@@ -53,7 +55,7 @@ except:
     import gapsencoder
     import unaryencoder
     import vbencoder as vbenc
-    from bitbytearray import BitByteArray, bitbyteutils as bbutils
+    from bitbytearray import BitWriter, bitbyteutils as bbutils
 
 # Diccionario de posibles máscaras de bits de 0 a 32.
 MASKS = {x: (1 << x)-1 for x in range(0, 33)}
@@ -61,6 +63,20 @@ MASKS = {x: (1 << x)-1 for x in range(0, 33)}
 # Máscaras de lectura para bit vectors.
 BV_MASKS = {0: 128, 1: 64, 2: 32, 3: 16, 4: 8, 5: 4, 6: 2, 7: 1}
 
+# Cantidad de 0s (terminadores) y de 1s entre muestras del índice de select
+# de upper bits (ver EliasFanoReader).
+SELECT_SAMPLE_RATE = 256
+
+# Posiciones (bit index) de los 0s y de los 1s de cada posible byte.
+SELECT_ZEROS = [[i for i in range(0, 8) if not byte & BV_MASKS[i]]
+                for byte in range(0, 256)]
+SELECT_ONES = [[i for i in range(0, 8) if byte & BV_MASKS[i]]
+               for byte in range(0, 256)]
+
+# Máscaras de los bits anteriores al bit index dado (de un byte).
+READ_BEFORE_MASKS = {0: 0, 1: 128, 2: 192, 3: 224, 4: 240, 5: 248, 6: 252,
+                     7: 254}
+
 
 def __delta_encode_since_min(numbers):
     '''Siendo 'y' el 1er número del listado pasado por parámetro, decrementa
@@ -117,20 +133,23 @@ def __delta_decode_since_min(encoded):
     return decoded
 
 
-def bv_encode(numbers):
+def bv_encode(numbers, base=0):
     '''Codifica una lista de números utilizando un vector característico.
 
     Args:
         numbers (int list): números a codificar.
+        base (int): número a restar a cada número (el bit 0 del vector
+            corresponde a base).
 
     Returns:
         encoded (byte list): lista codificada.
         padding (int): relleno (en bits) del último byte de la codificación.
     '''
-    max_number = numbers[-1]
+    max_number = numbers[-1] - base
     encoded = bytearray(int(math.ceil(float(max_number+1)/8)))
 
     for number in numbers:
+        number -= base
         array_index = number >> 3  # int(number/8)
         bit_index = number & 7     # number % 8
 
@@ -153,6 +172,10 @@ def bv_decode(encoded, nums, offset):
 
     Returns:
         decoded (int list): números decodificados.
+
+    Nota: la lectura finaliza al hallar 'nums' números, por lo que encoded
+    puede contener otros datos luego del vector (por ejemplo, ser un archivo
+    completo mapeado en memoria).
     '''
     decoded = []
 
@@ -165,10 +188,10 @@ def bv_decode(encoded, nums, offset):
     number = 0
 
     # Max number según bits...
-    max_number = len(encoded[array_index:]) << 3  # << 3 = * 8
+    max_number = (len(encoded) - array_index) << 3  # << 3 = * 8
 
     # '<' y no '<='ya que number comienza desde 0 (cero)
-    while number < max_number:
+    while number < max_number and len(decoded) < nums:
         if encoded[array_index] == 255:
             decoded.extend(range(number, number+8))
             number += 8
@@ -193,74 +216,53 @@ def bv_decode(encoded, nums, offset):
     return decoded[:nums]
 
 
-def __encode_upper(upper_numbers):
+def __encode_upper(writer, upper_numbers):
     '''Codifica y realiza gaps de una lista de números, que representan los
     números superiores (upper numbers) de una codificación EF.
 
     Args:
+        writer (BitWriter): writer sobre el que se escribirá la codificación.
         upper_numbers (int list): lista de upper numbers.
-
-    Returns:
-        upper_bits (BitByteArray): representación binaria de upper numbers.
     '''
     # Gaps.
     upper_gaps = gapsencoder.encode(upper_numbers)
 
-    # Encode de gaps.
-    upper_bbarray = BitByteArray()
+    # Encode unario de gaps.
+    write_unary = writer.write_unary
     for number in upper_gaps:
-        uencode, padding = unaryencoder.encode(number, optimize=False)
-        upper_bbarray.extend(uencode, padding)
-
-    return upper_bbarray
+        write_unary(number)
 
 
-def __encode_lower(lower_numbers, l):
+def __encode_lower(writer, lower_numbers, l):
     '''Codifica una lista de números, que representan los números bajos (lower
     numbers) de una codificación EF.
 
     Args:
+        writer (BitWriter): writer sobre el que se escribirá la codificación.
         lower_numbers (int list): lista de lower numbers.
         l (int): cantidad de bits utilizados por número en la parte baja.
-
-    Returns:
-        lower_bits (BitByteArray): representación binaria de lower numbers.
     '''
-    # Padding necesario del último byte en la representación del número como
-    # una secuencia de bytes.
-    padding = (8 - (l % 8))
-    if padding == 8:
-        padding = 0
-
-    lower_bbarray = BitByteArray()
+    write_bits = writer.write_bits
     for number in lower_numbers:
-        # Corrimiento según padding.
-        number = number << padding
-        number = bbutils.to_bytes(int(math.ceil(l/float(8))), number)
-        lower_bbarray.extend(number, padding)
-
-    return lower_bbarray
+        write_bits(number, l)
 
 
-def __merge_encodes(l, lower_encode, upper_encode):
+def __merge_encodes(l, writer):
     '''Unifica las codificaciones lower y upper, agregando header.
 
     Args:
         l (int): cantidad de bits utilizados por número en la parte baja.
-        lower_encode (int list): codificación de lower numbers.
-        upper_encode (int list): codificación de upper numbers.
+        writer (BitWriter): writer con las codificaciones lower + upper.
 
     Returns:
         encoded (byte list): codificación final.
         padding (int): cantidad de bits de relleno del último byte.
     '''
-    lower_encode.extend(upper_encode, upper_encode.padding())
-
     lheader = bbutils.to_byte(l)
 
-    padding = lower_encode.padding()
+    padding = writer.padding()
 
-    encoded = bytearray(lheader + lower_encode.to_bytearray())
+    encoded = bytearray(lheader + writer.to_bytearray())
     return encoded, padding
 
 
@@ -310,27 +312,33 @@ def encode(numbers):
         upper_numbers.append(upper)
         lower_numbers.append(lower)
 
-    # 1. Encode unary de upper bits.
-    upper_encode = __encode_upper(upper_numbers)
+    # Writer con espacio reservado según tamaño estimado: l bits por número
+    # en la parte baja y, como máximo, 2 bits por número en la parte alta.
+    writer = BitWriter(((l + 2) * list_size) >> 3)
 
-    # 2. Encode l bits de lower bits.
-    lower_encode = __encode_lower(lower_numbers, l)
+    # 1. Encode l bits de lower bits.
+    __encode_lower(writer, lower_numbers, l)
+
+    # 2. Encode unary de upper bits.
+    __encode_upper(writer, upper_numbers)
 
     # 3. Merge
     encoded = []
     encoded = bytearray(vbenc.encode(first_number))
-    merged, padding = __merge_encodes(l, lower_encode, upper_encode)
+    merged, padding = __merge_encodes(l, writer)
     encoded += merged
 
     return encoded, padding
 
 
-def decode(encoded, nums):
+def decode(encoded, nums, offset=0):
     '''Decodifica una lista codificada en Elias Fano.
 
     Args:
         encoded (int list): números codificados.
         nums (int): cantidad de números a decodificar.
+        offset (int): nro. de bit de inicio de lectura (múltiplo de 8). La
+            lista se lee directamente desde encoded, sin copiarla.
 
     Returns:
         decoded (int list): números decodificados.
@@ -338,9 +346,9 @@ def decode(encoded, nums):
     # Lectura de primer número vb.
     decoded = []
     if nums == 1:
-        return vbenc.decode(encoded)
+        return vbenc.decode(encoded, 1, offset)
 
-    first_number, offset = vbenc.decode_number(encoded)
+    first_number, offset = vbenc.decode_number(encoded, offset)
     decoded = [first_number]
 
     # Lectura de header. Nota: >> 3 = /8
@@ -355,11 +363,13 @@ def decode(encoded, nums):
         return __delta_decode_since_min(decoded)
 
     # Elias Fano decode.
+    # Decode unario (por tabla) de la totalidad de los gaps de upper bits.
+    uppers = unaryencoder.decode(encoded, nums, False, upper_offset)
+
     delta = 0
-    for _ in range(nums):
-        # Decode de lower y upper
+    for upper in uppers:
+        # Decode de lower.
         lower = bitutils.read_binary_from_barray(encoded, lower_offset, l)
-        upper = unaryencoder.decode(encoded, 1, False, upper_offset)[0]
 
         # Incremento para próxima lectura.
         delta += upper
@@ -369,12 +379,271 @@ def decode(encoded, nums):
         # Incremento lower offset.
         lower_offset += l
 
-        # Incremento upper offset: +1 por terminador.
-        upper_offset += upper + 1
-
     return __delta_decode_since_min(decoded)
 
 
+class EliasFanoReader(object):
+    '''Permite el acceso aleatorio a una lista codificada en Elias Fano, sin
+    decodificar sus números previos. Para ello, al inicializarse, construye
+    un índice de select muestreado sobre los upper bits: la posición de cada
+    SELECT_SAMPLE_RATE 0s (terminadores, uno por número) y de cada
+    SELECT_SAMPLE_RATE 1s (incrementos de upper). De este modo, cada lectura
+    sólo recorre los bytes que hay desde la muestra más cercana.
+
+    Nota: las listas de tamaño 1 y las codificadas con vectores de bits se
+    decodifican completamente al inicializar el reader.'''
+
+    def __init__(self, encoded, nums, offset=0):
+        '''Inicializa clase.
+
+        Args:
+            encoded (byte list): números codificados (ver encode).
+            nums (int): cantidad de números de la codificación.
+            offset (int): nro. de bit de inicio de la codificación (múltiplo
+                de 8) en encoded.
+        '''
+        self.__encoded = encoded
+        self.__nums = nums
+
+        # Lista decodificada (sólo para VByte y vectores de bits).
+        self.__decoded = None
+
+        if nums == 1:
+            self.__decoded = decode(encoded, nums, offset)
+            return
+
+        start = offset
+        first_number, offset = vbenc.decode_number(encoded, offset)
+
+        # Lectura de header. Nota: >> 3 = /8
+        l = encoded[(offset >> 3)]
+        offset += 8
+
+        if l == 255:
+            self.__decoded = decode(encoded, nums, start)
+            return
+
+        self.__l = l
+        self.__lower_offset = offset
+        self.__upper_offset = offset + (l * nums)
+
+        self.__build_select_index()
+
+        # Primer número de la lista original: como el resto de los números se
+        # codifican en relación a este (ver __delta_encode_since_min), su
+        # valor es también la base de los restantes números.
+        self.__first = first_number + self.__read(0)
+
+    def __len__(self):
+        '''Retorna la cantidad de números de la codificación.
+
+        Returns:
+            len (int): cantidad de números.
+        '''
+        return self.__nums
+
+    def __build_select_index(self):
+        '''Construye el índice de select muestreado, recorriendo los upper bits
+        byte a byte (sin decodificar los números).'''
+        encoded = self.__encoded
+        upper_offset = self.__upper_offset
+
+        # Muestras: posición (relativa a upper offset) posterior al 0 o al 1
+        # de rango k*SELECT_SAMPLE_RATE-1, para cada k.
+        zero_samples = [0]
+        one_samples = [0]
+
+        zeros = 0
+        ones = 0
+
+        byte_index = upper_offset >> 3
+        bit_index = upper_offset & 7
+        byte = encoded[byte_index]
+
+        while zeros < self.__nums:
+            # Posición (relativa a upper offset) del primer bit del byte.
+            position = (byte_index << 3) - upper_offset
+
+            # Bits del byte anteriores a upper offset (1er byte): se marcan en
+            # 1 para la búsqueda de 0s, y en 0 para la búsqueda de 1s.
+            byte_zeros = SELECT_ZEROS[byte | READ_BEFORE_MASKS[bit_index]]
+            byte_ones = SELECT_ONES[byte & ~READ_BEFORE_MASKS[bit_index]]
+
+            # Muestras de 0s contenidas en el byte.
+            next_sample = len(zero_samples) * SELECT_SAMPLE_RATE
+            while zeros + len(byte_zeros) >= next_sample:
+                rank = next_sample - 1 - zeros
+                zero_samples.append(position + byte_zeros[rank] + 1)
+                next_sample += SELECT_SAMPLE_RATE
+
+            # Muestras de 1s contenidas en el byte.
+            next_sample = len(one_samples) * SELECT_SAMPLE_RATE
+            while ones + len(byte_ones) >= next_sample:
+                rank = next_sample - 1 - ones
+                one_samples.append(position + byte_ones[rank] + 1)
+                next_sample += SELECT_SAMPLE_RATE
+
+            # Si el byte contiene el último terminador, los 1s posteriores (si
+            # los hubiera) no pertenecen a la codificación.
+            if zeros + len(byte_zeros) >= self.__nums:
+                last = byte_zeros[self.__nums - 1 - zeros]
+                ones += len([i for i in byte_ones if i < last])
+            else:
+                ones += len(byte_ones)
+
+            zeros += len(byte_zeros)
+            byte_index += 1
+            bit_index = 0
+            if zeros < self.__nums:
+                byte = encoded[byte_index]
+
+        self.__zero_samples = zero_samples
+        self.__one_samples = one_samples
+
+        # Cantidad total de 1s: máximo upper de la codificación.
+        self.__total_ones = ones
+
+    def __select(self, rank, samples, selects, before_mask):
+        '''Retorna la posición (relativa a upper offset) del bit de rango dado,
+        partiendo de la muestra más cercana.
+
+        Args:
+            rank (int): rango (desde 0) del bit buscado.
+            samples (int list): muestras del índice (de 0s o 1s).
+            selects (int list list): tabla de posiciones (SELECT_ZEROS o
+                SELECT_ONES).
+            before_mask (bool): indica si los bits anteriores a la muestra se
+                deben marcar en 1 (búsqueda de 0s) o en 0 (búsqueda de 1s).
+
+        Returns:
+            position (int): posición del bit.
+        '''
+        encoded = self.__encoded
+
+        # Muestra más cercana.
+        sample = rank // SELECT_SAMPLE_RATE
+        rank -= sample * SELECT_SAMPLE_RATE
+        offset = self.__upper_offset + samples[sample]
+
+        byte_index = offset >> 3
+        mask = READ_BEFORE_MASKS[offset & 7]
+        if before_mask:
+            byte = encoded[byte_index] | mask
+        else:
+            byte = encoded[byte_index] & ~mask
+
+        while True:
+            positions = selects[byte]
+            if rank < len(positions):
+                return (byte_index << 3) + positions[rank] - self.__upper_offset
+
+            rank -= len(positions)
+            byte_index += 1
+            byte = encoded[byte_index]
+
+    def __read(self, index):
+        '''Retorna el número de la secuencia EF (sin decodificación delta) del
+        índice dado.
+
+        Args:
+            index (int): índice del número.
+
+        Returns:
+            number (int): número leído.
+        '''
+        # Upper: cantidad de 1s anteriores al terminador del número.
+        upper = self.__select(index, self.__zero_samples, SELECT_ZEROS,
+                              True) - index
+
+        lower_offset = self.__lower_offset + (index * self.__l)
+        lower = bitutils.read_binary_from_barray(self.__encoded, lower_offset,
+                                                 self.__l)
+
+        return (upper << self.__l) + lower
+
+    def access(self, index):
+        '''Retorna el número del índice dado de la lista original.
+
+        Args:
+            index (int): índice del número (desde 0).
+
+        Returns:
+            number (int): número de la lista.
+        '''
+        if index < 0 or index >= self.__nums:
+            raise IndexError("Índice fuera de rango.")
+
+        if self.__decoded is not None:
+            return self.__decoded[index]
+
+        if index == 0:
+            return self.__first
+
+        return self.__first + self.__read(index)
+
+    def next_geq(self, number):
+        '''Busca el primer número de la lista mayor o igual al dado.
+
+        Args:
+            number (int): número a buscar.
+
+        Returns:
+            index (int): índice del número hallado (o cantidad de números de la
+                lista, si no existe).
+            found (int): número hallado (o None, si no existe).
+        '''
+        if self.__decoded is not None:
+            index = bisect.bisect_left(self.__decoded, number)
+            if index == self.__nums:
+                return index, None
+            return index, self.__decoded[index]
+
+        if number <= self.__first:
+            return 0, self.__first
+
+        # Número buscado en la secuencia EF.
+        target = number - self.__first
+        high = target >> self.__l
+
+        if high > self.__total_ones:
+            return self.__nums, None
+
+        # Primer número con upper >= high: cantidad de 0s anteriores al 1 de
+        # rango high-1 (si high es 0, el primer número de la secuencia).
+        index = 0
+        if high > 0:
+            index = self.__select(high - 1, self.__one_samples, SELECT_ONES,
+                                  False) - (high - 1)
+
+        # Nota: el índice 0 de la secuencia EF no sigue la base de los
+        # restantes (ver __delta_encode_since_min).
+        index = max(index, 1)
+
+        # Recorrido secuencial de los números del bucket.
+        upper_position = self.__select(index, self.__zero_samples,
+                                       SELECT_ZEROS, True)
+        upper = upper_position - index
+        l = self.__l
+        while True:
+            lower_offset = self.__lower_offset + (index * l)
+            lower = bitutils.read_binary_from_barray(self.__encoded,
+                                                     lower_offset, l)
+            found = (upper << l) + lower
+            if found >= target:
+                return index, self.__first + found
+
+            index += 1
+            if index == self.__nums:
+                return index, None
+
+            # Lectura unaria del gap de upper del siguiente número.
+            gap, offset = unaryencoder.decode_number(
+                self.__encoded, False,
+                self.__upper_offset + upper_position + 1)
+            upper += gap
+            upper_position = offset - 1 - self.__upper_offset
+
+
 def main():
     '''Prueba de funcionamiento de las funciones encode y decode.'''
     print("Prueba de encode/decode de 1 millón de enteros en curso...")
@@ -4,23 +4,59 @@
 - Nombre: gammaencoder.py
 - Descripción: permite encode/decode de enteros a/desde Elias Gamma.
 - Autor: Agustín González
-- Modificado: 17/04/18
+- Modificado: 16/10/26
 '''
 
-import math
-
 try:
     # Relative import.
     from . import bitbytearray as bbarray
     from . import unaryencoder as ue
+    from . import gapsencoder as gapsenc
     from . import bitutils
 except:
     # Import para ejecución 'directa' del script.
     import time
     import bitutils
     import unaryencoder as ue
+    import gapsencoder as gapsenc
     import bitbytearray as bbarray
 
+# Tamaño (en bits) de la ventana de lectura de la tabla de decodificación.
+WINDOW_SIZE = 16
+
+
+def __build_decode_table():
+    '''Construye la tabla de decodificación de ventanas de WINDOW_SIZE bits:
+    para cada posible ventana cuyo prefijo sea un código Gamma completo, la
+    entrada contiene el número decodificado y el tamaño (en bits) del código.
+    Las restantes entradas (códigos de más de WINDOW_SIZE bits) son None.
+
+    Returns:
+        table (tuple list): tabla de 2^WINDOW_SIZE entradas.
+    '''
+    table = [None] * (1 << WINDOW_SIZE)
+
+    # Códigos de tamaño 2*vb_size+1 que entran en la ventana.
+    vb_size = 0
+    while (vb_size << 1) + 1 <= WINDOW_SIZE:
+        code_size = (vb_size << 1) + 1
+        free_bits = WINDOW_SIZE - code_size
+        for vb_number in range(0, 1 << vb_size):
+            # Código: vb_size 1s, terminador y bits bajos del número.
+            code = (((1 << vb_size) - 1) << (vb_size + 1)) + vb_number
+            entry = ((1 << vb_size) + vb_number, code_size)
+
+            # Todas las ventanas con el código como prefijo.
+            start = code << free_bits
+            table[start:start + (1 << free_bits)] = [entry] * (1 << free_bits)
+        vb_size += 1
+
+    return table
+
+
+# Tabla de decodificación por ventanas (ver __build_decode_table).
+DECODE_TABLE = __build_decode_table()
+
 
 def compute_encoded_size(numbers):
     '''Calcula el tamaño de codificación final de la lista dada.
@@ -33,111 +69,108 @@ def compute_encoded_size(numbers):
     '''
     size = 0
     for number in numbers:
-        number_size = (math.floor((math.log(number, 2))) << 1) + 1  # << 1 = *2
-        size += number_size
+        # Nota: (bit_length - 1) << 1 = floor(log2(n)) * 2
+        size += ((number.bit_length() - 1) << 1) + 1
     return size
 
 
-def __to_vb(number):
-    '''Codifica un entero a Variable Byte (de 8 bits, sin terminadores).
+def encode(number):
+    '''Codifica un entero a Gamma.
 
     Args:
         number (int): número a codificar.
 
     Returns:
-        encoded (bytes): número codificado.
-        padding (int): bits de relleno del último byte del encoded.
+        encoded (byte list): número codificado como array de bytes.
+        padding (int): relleno (en bits) del último byte de la codificación.
     '''
-    # Bits requeridos para la representación original.
-    required_bits = int(math.floor(math.log(number, 2))+1)
-
-    # Eliminación de bit más significativo. -1 ya que es exponente (ej.: 2^0).
-    number -= (2 ** (required_bits-1))
-
-    # Nuevos bits req. (como se eliminó el bit más representativo, se resta 1).
-    new_required_bits = required_bits-1
+    # Tamaño del número sin su bit más significativo.
+    size = number.bit_length() - 1
 
-    # Bytes requeridos en la nueva representación.
-    required_bytes = int(math.ceil((new_required_bits)/float(8)))
+    writer = bbarray.BitWriter()
 
-    # Cálculo de padding del número a codificar.
-    padding = 8 - ((new_required_bits) & 7)  # % 8 = & 7
-    if padding == 8:
-        padding = 0
+    # 1. Encode de size de número (unary).
+    writer.write_unary(size)
 
-    # Shift de número según padding.
-    number <<= padding
+    # 2. Encode de número sin su bit más significativo (binario).
+    writer.write_bits(number - (1 << size), size)
 
-    # Conversión a secuencia de bytes.
-    # encoded = number.to_bytes(required_bytes, byteorder="big")
-    encoded = bbarray.bitbyteutils.to_bytes(required_bytes, number)
-    return encoded, padding
+    return writer.to_bytearray(), writer.padding()
 
 
-def __merge_encodes(unary_encode, unary_padding, vb_encode, vb_padding):
-    '''Unifica codificación unaria y vb.
+def encode_list(numbers):
+    '''Codifica una lista de enteros a Gamma sobre un único array de bits.
 
     Args:
-        unary_encode (byte list): codificación unaria de tamaño de número.
-        unary_padding (int): bits de relleno del último byte del uencoded.
-        vb_encode (byte list): codificación vb de número.
-        vb_padding (int): bits de relleno del último byte del vbencoded.
+        numbers (int list): números a codificar.
 
     Returns:
-        encoded (byte list): codificación final.
+        encoded (bytearray): números codificados.
+        padding (int): relleno (en bits) del último byte de la codificación.
     '''
-    encoded = bbarray.BitByteArray()
+    if 0 in numbers:
+        ex = "No es posible representar el 0 (cero) en Gamma."
+        raise Exception(ex)
 
-    encoded.extend(unary_encode, unary_padding)
-    padding = encoded.extend(vb_encode, vb_padding)
+    # Tamaño de la codificación (en bits): 2*size + 1 por número.
+    sizes = [number.bit_length() - 1 for number in numbers]
+    bits = (sum(sizes) << 1) + len(sizes)
 
-    return encoded.to_bytearray(), padding
+    # Nota: (n + 7) >> 3 = techo(n/8)
+    writer = bbarray.BitWriter((bits + 7) >> 3)
 
+    for i in range(0, len(numbers)):
+        size = sizes[i]
 
-def encode(number):
-    '''Codifica un entero a Gamma.
+        # Unario de size seguido del número sin su bit más significativo, en
+        # una única escritura: ((1 << size) - 1) << (size + 1) son size 1s
+        # seguidos del terminador y de size bits en 0.
+        writer.write_bits((((1 << size) - 1) << (size + 1)) |
+                          (numbers[i] ^ (1 << size)), (size << 1) + 1)
 
-    Args:
-        number (int): número a codificar.
-
-    Returns:
-        encoded (byte list): número codificado como array de bytes.
-    '''
-    # 1. Encode de número (vb).
-    vbencoded, vbpadding = __to_vb(number)
+    return writer.to_bytearray(), writer.padding()
 
-    # Size de vb.
-    size = (len(vbencoded)*8)-vbpadding
 
-    # 2. Encode de size de número (unary).
-    uencoded, upadding = ue.encode(size, optimize=False)
-
-    # 3. Merge de encodes.
-    encoded, padding = __merge_encodes(uencoded, upadding, vbencoded, vbpadding)
-    return encoded, padding
-
-
-def decode(encoded, nums):
-    '''Decodifica una secuencia de bytes codificada en Gamma
+def decode(encoded, nums, offset=0, prefix_sum=False, base=0):
+    '''Decodifica una secuencia de bytes codificada en Gamma. Cada número se
+    obtiene con una única búsqueda en DECODE_TABLE, según la ventana de bits
+    que comienza en el offset actual. Sólo los códigos que exceden la ventana
+    (y los últimos bytes del array) se leen mediante unario + binario.
 
     Args:
         encoded (byte list): números codificados.
         nums (int): cantidad de números a decodificar.
+        offset (int): nro. de bit de inicio de lectura.
+        prefix_sum (bool): indica si los números decodificados son gaps, en
+            cuyo caso se retorna su suma acumulada desde base (ver
+            gapsencoder.prefix_sum). Por omisión, en False.
+        base (int): número desde el que se acumulan los gaps.
 
     Returns:
         decoded (int list): números decodificados.
     '''
     decoded = []
 
-    offset = 0
+    # Último byte index desde el que es posible leer una ventana (3 bytes).
+    last_window_index = len(encoded) - 3
 
     for _ in range(0, nums):
-        # 1. Lectura unaria de tamaño de número (vb_size).
-        uereturned = ue.decode(encoded, 1, False, offset)
-        vb_size = uereturned[0]
+        byte_index = offset >> 3
 
-        # +1 por 0 (cero) terminador de unary encode.
-        offset += vb_size + 1
+        if byte_index <= last_window_index:
+            # Ventana de WINDOW_SIZE bits desde el offset. Nota: n & 7 = n % 8
+            window = ((encoded[byte_index] << 16) +
+                      (encoded[byte_index+1] << 8) +
+                      encoded[byte_index+2]) >> (8 - (offset & 7))
+            entry = DECODE_TABLE[window & 0xFFFF]
+
+            if entry is not None:
+                decoded.append(entry[0])
+                offset += entry[1]
+                continue
+
+        # 1. Lectura unaria de tamaño de número (vb_size).
+        vb_size, offset = ue.decode_number(encoded, False, offset)
 
         # 2. Lectura binaria.
         number = bitutils.read_binary_from_barray(encoded, offset, vb_size)
@@ -152,6 +185,9 @@ def decode(encoded, nums):
         # Incremento de offset según bits leídos (vb_size).
         offset += vb_size
 
+    if prefix_sum:
+        return gapsenc.prefix_sum(decoded, base)
+
     return decoded
 
 
@@ -5,9 +5,23 @@
 - Descripción: permite encode/decode de enteros a/desde gaps, siendo un gap la
 diferencia de c/elemento del listado con su antecesor (exceptuando al primero).
 - Autor: Agustín González
-- Modificado: 08/04/18
+- Modificado: 16/10/26
 '''
 
+from itertools import chain, islice
+
+try:
+    # Py3: suma acumulada en C.
+    from itertools import accumulate
+except ImportError:
+    accumulate = None
+
+try:
+    # NumPy es opcional: permite la suma acumulada de arrays (ver prefix_sum).
+    import numpy as np
+except ImportError:
+    np = None
+
 
 def encode(numbers):
     '''Codifica una lista de números utilizando gaps.
@@ -28,23 +42,52 @@ def encode(numbers):
     return gaps
 
 
-def decode(gaps):
-    '''Decodifica una lista de gaps.
+def prefix_sum(gaps, base=0):
+    '''Retorna la suma acumulada de una lista de gaps desde el número base
+    dado, es decir, numbers[i] = base + gaps[0] + ... + gaps[i]. Los
+    decodificadores de los distintos códecs la utilizan para decodificar
+    docids directamente (ver parámetro prefix_sum de cada decode).
 
     Args:
-        gaps (int list): números codificados.
+        gaps (int list): gaps a sumar (o array de NumPy).
+        base (int): número desde el que se acumulan los gaps.
 
     Returns:
         numbers (int list): números decodificados.
     '''
-    numbers = [gaps.pop(0)]
-
+    # Array de NumPy: suma acumulada vectorizada.
+    if np is not None and isinstance(gaps, np.ndarray):
+        numbers = np.cumsum(gaps, dtype=np.uint64)
+        if base > 0:
+            numbers += np.uint64(base)
+        elif base < 0:
+            numbers -= np.uint64(-base)
+        return numbers.tolist()
+
+    if accumulate is not None:
+        # El número base se antepone a los gaps y luego se descarta.
+        return list(islice(accumulate(chain((base,), gaps)), 1, None))
+
+    numbers = []
     for gap in gaps:
-        numbers.append(gap + numbers[-1])
+        base += gap
+        numbers.append(base)
 
     return numbers
 
 
+def decode(gaps):
+    '''Decodifica una lista de gaps (sin modificar la lista recibida).
+
+    Args:
+        gaps (int list): números codificados.
+
+    Returns:
+        numbers (int list): números decodificados.
+    '''
+    return prefix_sum(gaps)
+
+
 def main():
     '''Prueba de funcionamiento de las funciones encode y decode.'''
 
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+- Nombre: groupvarintencoder.py
+- Descripción: permite encode/decode de enteros a/desde Group Varint.
+- Autor: Agustín González
+- Modificado: 16/10/26
+
+Nota: algoritmo basado en "Challenges in Building Large-Scale Information
+Retrieval Systems" de J. Dean (WSDM 2009) y en "Decoding billions of integers
+per second through vectorization" de Lemire y Boytsov.
+
+Funcionamiento básico: los números se codifican en grupos de 4. Cada grupo se
+inicia con un byte descriptor que contiene la cantidad de bytes (menos 1) de
+cada número del grupo, de a 2 bits (el número i del grupo en los bits 2i y
+2i+1). A continuación, se escriben los bytes de los 4 números (little
+endian). A diferencia de Variable Byte (ver vbencoder.py), no se requiere un
+bit de continuación por byte: la decodificación de un grupo se define
+completamente por su descriptor. Por ello, la decodificación recorre los
+descriptores para armar el formato struct de tramos de hasta RUN_GROUPS grupos
+consecutivos (ver RUN_FORMATS), cada uno de los cuales se lee con un único
+unpack_from. Los números de 3 bytes (que struct no permite leer como un único
+campo) se leen como un campo de 2 bytes y otro de 1 byte ("HB"), que se
+combinan luego del unpack, por lo que no interrumpen el tramo. Los números
+deben ser de 32 bits como máximo. Si la cantidad de números no es múltiplo de
+4, el último grupo se completa con 0s.
+
+Nota: en lugar de una tabla de offsets y longitudes por descriptor leída con
+int.from_bytes (una llamada por número), se utilizan formatos struct, ya que
+un único unpack_from decodifica todos los números de un tramo en C.
+
+encoded = [descriptor][bytes de 4 números][descriptor][...]
+'''
+
+import struct
+import time
+from itertools import compress, count
+
+# Cantidad de números por grupo.
+GROUP_SIZE = 4
+
+# Máximo número permitido (32 bits).
+MAX_NUMBER = (1 << 32) - 1
+
+# Formato struct (little endian) de un número según su cantidad de bytes. Los
+# números de 3 bytes se leen como un entero de 2 bytes y uno de 1 byte.
+BYTES_FORMATS = {1: "B", 2: "H", 3: "HB", 4: "I"}
+
+
+def __descriptor_lengths(descriptor):
+    '''Retorna la cantidad de bytes de cada número del grupo según el
+    descriptor dado.
+
+    Args:
+        descriptor (int): byte descriptor del grupo.
+
+    Returns:
+        lengths (int list): cantidad de bytes de cada número.
+    '''
+    return [((descriptor >> (i << 1)) & 3) + 1 for i in range(0, GROUP_SIZE)]
+
+
+def __build_decode_kernel(descriptor):
+    '''Genera una función de decodificación 'desenrollada' para el descriptor
+    dado (ver simple16encoder.DECODE_KERNELS): los bytes del grupo se leen con
+    un único unpack_from de un struct precompilado.
+
+    Args:
+        descriptor (int): descriptor de la función a generar.
+
+    Returns:
+        kernel (function): función de la forma kernel(encoded, offset,
+            numbers), siendo offset el índice del primer byte de datos.
+    '''
+    lengths = __descriptor_lengths(descriptor)
+
+    fields = []
+    slots = []
+    for length in lengths:
+        if length == 3:
+            # Número de 3 bytes: 2 bytes bajos + byte alto.
+            slots.append("f{0} | (f{1} << 16)".format(len(fields),
+                                                      len(fields)+1))
+            fields += ["f{0}".format(len(fields)),
+                       "f{0}".format(len(fields)+1)]
+        else:
+            slots.append("f{0}".format(len(fields)))
+            fields.append("f{0}".format(len(fields)))
+
+    unpack_format = "<" + "".join(BYTES_FORMATS[length] for length in lengths)
+
+    name = "decode_descriptor_{0}".format(descriptor)
+    source = "def {0}(encoded, offset, numbers):\n".format(name)
+    source += "    {0}, = unpack_from(encoded, offset)\n".format(
+        ", ".join(fields))
+    source += "    numbers.extend(({0},))\n".format(", ".join(slots))
+
+    namespace = {"unpack_from": struct.Struct(unpack_format).unpack_from}
+    exec(source, namespace)
+    return namespace[name]
+
+
+# Funciones de decodificación por descriptor (índice = descriptor).
+DECODE_KERNELS = [__build_decode_kernel(descriptor)
+                  for descriptor in range(0, 256)]
+
+# Cantidad de bytes de datos de cada grupo por descriptor.
+GROUP_BYTES = [sum(__descriptor_lengths(descriptor))
+               for descriptor in range(0, 256)]
+
+# Formato struct de cada grupo por descriptor (el descriptor se omite con
+# 'x') para la lectura por tramos.
+RUN_FORMATS = ["x" + "".join(BYTES_FORMATS[length]
+                             for length in __descriptor_lengths(descriptor))
+               for descriptor in range(0, 256)]
+
+# Tabla de traducción (bytes.translate) de descriptor a 1 si el grupo
+# contiene números de 3 bytes, o 0 en caso contrario.
+RUN_SPLITS = bytes(int(3 in __descriptor_lengths(descriptor))
+                   for descriptor in range(0, 256))
+
+# Máscaras de campos struct de cada grupo por descriptor (un byte por campo):
+# campos a conservar (todos excepto el campo alto, byte 'B' de "HB", de los
+# números de 3 bytes) y campos altos de los números de 3 bytes.
+RUN_KEEP_MASKS = [bytes(mask for length in __descriptor_lengths(descriptor)
+                        for mask in ((1, 0) if length == 3 else (1,)))
+                  for descriptor in range(0, 256)]
+RUN_HIGH_MASKS = [bytes(mask for length in __descriptor_lengths(descriptor)
+                        for mask in ((0, 1) if length == 3 else (0,)))
+                  for descriptor in range(0, 256)]
+
+# Cantidad máxima de grupos por tramo (acota el tamaño del formato struct).
+RUN_GROUPS = 4096
+
+
+def __number_length(number):
+    '''Retorna la cantidad de bytes requeridos por un número (de 1 a 4).
+
+    Args:
+        number (int): número a evaluar.
+
+    Returns:
+        length (int): cantidad de bytes.
+    '''
+    if number > MAX_NUMBER or number < 0:
+        ex = "Group Varint no permite codificar números de más de 32 bits."
+        raise Exception(ex)
+
+    # Nota: (n + 7) >> 3 = techo(n/8)
+    return (number.bit_length() + 7) >> 3 or 1
+
+
+def compute_encoded_size(numbers):
+    '''Calcula el tamaño de codificación final de la lista dada.
+
+    Args:
+        numbers (int list): números a codificar.
+
+    Returns:
+        size (int): tamaño de codificación final en bits.
+    '''
+    groups = -(-len(numbers) // GROUP_SIZE)
+    padding = groups*GROUP_SIZE - len(numbers)
+    size = groups + padding + sum(__number_length(n) for n in numbers)
+
+    # Nota: n << 3 = n * 8
+    return size << 3
+
+
+def encode(numbers):
+    '''Codifica una lista de números a Group Varint.
+
+    Args:
+        numbers (int list): números a codificar.
+
+    Returns:
+        encoded (bytearray): números codificados.
+    '''
+    encoded = bytearray()
+
+    for start in range(0, len(numbers), GROUP_SIZE):
+        group = list(numbers[start:start+GROUP_SIZE])
+        if len(group) < GROUP_SIZE:
+            group += [0] * (GROUP_SIZE - len(group))
+
+        descriptor = 0
+        fields = []
+        pack_format = "<"
+        for i in range(0, GROUP_SIZE):
+            number = group[i]
+            length = __number_length(number)
+            descriptor |= (length - 1) << (i << 1)
+            pack_format += BYTES_FORMATS[length]
+
+            if length == 3:
+                fields += [number & 0xFFFF, number >> 16]
+            else:
+                fields.append(number)
+
+        encoded.append(descriptor)
+        encoded += struct.pack(pack_format, *fields)
+
+    return encoded
+
+
+def decode(encoded, nums, offset=0):
+    '''Decodifica una secuencia de bytes codificada en Group Varint. Los
+    grupos se leen directamente desde encoded (sin copia), por lo que puede
+    tratarse de cualquier objeto con protocolo buffer (bytes, bytearray,
+    memoryview, mmap).
+
+    Args:
+        encoded (bytes): números codificados.
+        nums (int): cantidad de números a decodificar.
+        offset (int): nro. de bit de inicio de lectura (múltiplo de 8).
+
+    Returns:
+        numbers (int list): números decodificados.
+    '''
+    numbers = []
+    group_bytes = GROUP_BYTES
+
+    # Nota: n >> 3 = int(n / 8)
+    offset >>= 3
+    groups = -(-nums // GROUP_SIZE)
+    while groups > 0:
+        # Descriptores del tramo (el resto del tramo se arma a partir de
+        # ellos, sin un ciclo por grupo).
+        start = offset
+        descriptors = bytearray(min(groups, RUN_GROUPS))
+        for i in range(0, len(descriptors)):
+            descriptor = descriptors[i] = encoded[offset]
+            offset += group_bytes[descriptor] + 1
+        groups -= len(descriptors)
+
+        # Lectura del tramo con un único unpack_from. Nota: se compila un
+        # struct propio (y no struct.unpack_from) para no desplazar el caché
+        # de formatos del módulo struct.
+        run_format = "<" + "".join(map(RUN_FORMATS.__getitem__, descriptors))
+        values = struct.Struct(run_format).unpack_from(encoded, start)
+        if 1 not in descriptors.translate(RUN_SPLITS):
+            numbers.extend(values)
+            continue
+
+        # Combinación de los campos de los números de 3 bytes: cada campo alto
+        # se suma al campo bajo anterior, y luego se descarta.
+        values = list(values)
+        high_masks = b"".join(map(RUN_HIGH_MASKS.__getitem__, descriptors))
+        for i in compress(count(), high_masks):
+            values[i-1] |= values[i] << 16
+        keep_masks = b"".join(map(RUN_KEEP_MASKS.__getitem__, descriptors))
+        numbers.extend(compress(values, keep_masks))
+
+    # Eliminación de números de relleno del último grupo.
+    del numbers[nums:]
+    return numbers
+
+
+def main():
+    '''Prueba de funcionamiento de las funciones encode y decode.'''
+    print("Prueba de encode/decode de 1 millón de enteros en curso...")
+    numbers = list(range(0, 1000000))
+
+    # Encode
+    start = time.time()
+    encoded = encode(numbers)
+    end = time.time()
+    encoded_time = end-start
+
+    # Decode
+    start = time.time()
+    decoded = decode(encoded, len(numbers))
+    end = time.time()
+    decoded_time = end-start
+
+    if numbers != decoded:
+        print(numbers[-5:], decoded[-5:])
+        print("ATENCIÓN: numbers != decoded.")
+        return
+
+    print("Encoded time: {0}".format(encoded_time))
+    print("Decoded time: {0}".format(decoded_time))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,478 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+- Nombre: indexbuilder.py
+- Descripción: contiene la clase 'IndexBuilder' (ver docstring), que permite
+construir un archivo de listas codificadas (ver postingfile.py) a partir de un
+flujo de postings (término, docid), con un presupuesto de memoria acotado.
+- Autor: Agustín González
+- Modificado: 16/10/26
+
+Funcionamiento básico (single-pass in-memory indexing con merge externo):
+1. Los postings se acumulan en memoria, en un array('I') de docids por
+   término, hasta alcanzar el presupuesto de memoria (estimado según la
+   cantidad de términos y de postings, ver POSTING_BYTES y TERM_BYTES).
+2. Al alcanzarlo, los términos y sus docids se ordenan (eliminando docids
+   duplicados), y se escriben en un archivo temporal (run) en orden de
+   término: por cada lista, un header (término, cantidad de números y tamaño
+   en bytes) y los gaps de sus docids (ver to_gaps) codificados en
+   RUN_CODEC.
+3. Al cerrar, si hay más de MERGE_FAN_IN runs, se combinan en pasadas de a
+   lo sumo MERGE_FAN_IN runs consecutivos, cada una escribiendo un run
+   intermedio, hasta que queden MERGE_FAN_IN o menos (de este modo, la
+   cantidad de archivos abiertos en simultáneo está acotada).
+4. Los runs restantes (y los postings aún en memoria) se combinan con un
+   merge de k vías (heapq.merge), leyendo cada run de forma secuencial, y
+   cada lista resultante se codifica con el códec final en el archivo de
+   listas. Sólo se mantiene en memoria la lista actual de cada run.
+
+Las listas de los códecs de INCREASING_CODECS (ver listcodec.py) se almacenan
+como docids; las del resto, como gaps (ver to_gaps y read_docids). El primer
+gap de cada lista se calcula en relación a -1 (es decir, es el primer docid
+más 1), por lo que ningún gap es 0 (cero): de este modo, los códecs que no
+permiten representar el 0 (Gamma, Elias Delta, Elias Omega) admiten el docid
+0.
+'''
+
+import heapq
+import os
+import shutil
+import struct
+import tempfile
+from array import array
+
+try:
+    # Relative import.
+    from . import EncodeTypes
+    from . import gapsencoder as gapsenc
+    from . import listcodec
+    from .postingfile import PostingFileWriter
+except:
+    # Import para ejecución 'directa' del script.
+    import time
+    import random
+    from __init__ import EncodeTypes
+    import gapsencoder as gapsenc
+    import listcodec
+    from postingfile import PostingFileWriter, PostingFileReader
+
+# Presupuesto de memoria por omisión (en bytes) de los postings en memoria.
+MEMORY_BUDGET = 1 << 28
+
+# Tamaño estimado (en bytes) de cada docid en memoria (array('I')).
+POSTING_BYTES = 4
+
+# Tamaño estimado (en bytes) de cada término en memoria: entrada del
+# diccionario, id de término y array('I') vacío.
+TERM_BYTES = 160
+
+# Cantidad máxima por omisión de runs combinados (abiertos) en simultáneo.
+MERGE_FAN_IN = 64
+
+# Códec de los gaps de cada lista de los runs.
+RUN_CODEC = EncodeTypes.VariableByte
+
+# Formato struct del header de cada lista de los runs: id de término,
+# cantidad de números y tamaño en bytes.
+RUN_HEADER_FORMAT = ">III"
+RUN_HEADER_SIZE = struct.calcsize(RUN_HEADER_FORMAT)
+
+
+def to_gaps(docids):
+    '''Codifica una lista estrictamente creciente de docids como gaps, con el
+    primer gap en relación a -1 (ver docstring del módulo).
+
+    Args:
+        docids (int list): docids a codificar.
+
+    Returns:
+        gaps (int list): gaps de los docids (todos mayores a 0).
+    '''
+    gaps = gapsenc.encode(docids)
+    gaps[0] += 1
+    return gaps
+
+
+def from_gaps(gaps):
+    '''Decodifica una lista de gaps codificada con to_gaps.
+
+    Args:
+        gaps (int list): gaps a decodificar.
+
+    Returns:
+        docids (int list): docids decodificados.
+    '''
+    return gapsenc.prefix_sum(gaps, -1)
+
+
+def write_run(path, lists):
+    '''Escribe listas de docids en un run.
+
+    Args:
+        path (str): ruta del run.
+        lists (iterable): tuplas de la forma (término, docids), en orden de
+            término.
+    '''
+    with open(path, "wb") as run_file:
+        for term, docids in lists:
+            encoded = listcodec.encode(to_gaps(docids), RUN_CODEC)
+            run_file.write(struct.pack(RUN_HEADER_FORMAT, term, len(docids),
+                                       len(encoded)))
+            run_file.write(encoded)
+
+
+def read_run(path, run):
+    '''Recorre las listas de un run de forma secuencial.
+
+    Args:
+        path (str): ruta del run.
+        run (int): índice del run (para mantener el orden de los runs en el
+            merge ante términos iguales).
+
+    Returns:
+        lists (generator): tuplas de la forma (término, run, docids).
+    '''
+    with open(path, "rb") as run_file:
+        while True:
+            header = run_file.read(RUN_HEADER_SIZE)
+            if not header:
+                return
+
+            term, nums, size = struct.unpack(RUN_HEADER_FORMAT, header)
+            gaps = listcodec.decode(run_file.read(size), nums, RUN_CODEC)
+            yield term, run, from_gaps(gaps)
+
+
+def __merge_lists(lists):
+    '''Combina las listas de docids de un término, provenientes de distintos
+    runs (en orden de run).
+
+    Args:
+        lists (int list list): listas crecientes de docids.
+
+    Returns:
+        docids (int list): lista creciente de docids, sin duplicados.
+    '''
+    # Caso usual (docids recibidos en orden creciente): las listas no se
+    # solapan, por lo que basta con concatenarlas.
+    docids = list(lists[0])
+    for i in range(1, len(lists)):
+        if lists[i][0] <= docids[-1]:
+            break
+        docids.extend(lists[i])
+    else:
+        return docids
+
+    # Listas solapadas: merge y eliminación de duplicados.
+    docids = []
+    for docid in heapq.merge(*lists):
+        if not docids or docid != docids[-1]:
+            docids.append(docid)
+    return docids
+
+
+def merge_runs(runs):
+    '''Combina las listas de múltiples runs (merge de k vías).
+
+    Args:
+        runs (generator list): runs, cada uno un iterable de tuplas (término,
+            run, docids) en orden de término (ver read_run).
+
+    Returns:
+        lists (generator): tuplas de la forma (término, docids), en orden de
+            término.
+    '''
+    term = None
+    lists = []
+    for run_term, _, docids in heapq.merge(*runs):
+        if run_term != term and lists:
+            yield term, __merge_lists(lists)
+            lists = []
+        term = run_term
+        lists.append(docids)
+
+    if lists:
+        yield term, __merge_lists(lists)
+
+
+def read_docids(reader, term):
+    '''Retorna los docids de un término de un archivo construido con
+    IndexBuilder (ver docstring del módulo).
+
+    Args:
+        reader (PostingFileReader): lector del archivo de listas.
+        term (int): id de término.
+
+    Returns:
+        docids (int list): docids del término.
+    '''
+    entry = reader.entry(term)
+    if entry is None:
+        raise KeyError(term)
+
+    numbers = reader.read(term)
+    if entry[3] in listcodec.INCREASING_CODECS:
+        return numbers
+    return from_gaps(numbers)
+
+
+class IndexBuilder(object):
+    '''Permite construir un archivo de listas codificadas a partir de postings
+    (término, docid) recibidos en cualquier orden, con un presupuesto de
+    memoria acotado (ver docstring del módulo).'''
+
+    def __init__(self, path, codec, memory_budget=MEMORY_BUDGET,
+                 temp_dir=None, merge_fan_in=MERGE_FAN_IN):
+        '''Inicializa clase.
+
+        Args:
+            path (str): ruta del archivo de listas a construir.
+            codec (EncodeTypes): códec de las listas del archivo.
+            memory_budget (int): presupuesto (en bytes) de los postings en
+                memoria.
+            temp_dir (str): directorio en el que se crean los runs. Por
+                omisión (None), el directorio temporal del sistema.
+            merge_fan_in (int): cantidad máxima de runs combinados en
+                simultáneo (ver docstring del módulo).
+        '''
+        if codec not in listcodec.ENCODERS:
+            raise Exception("Códec no soportado: {0}.".format(codec))
+
+        if merge_fan_in < 2:
+            raise Exception("El fan-in del merge debe ser al menos 2.")
+
+        self.__path = path
+        self.__codec = codec
+        self.__memory_budget = memory_budget
+        self.__merge_fan_in = merge_fan_in
+
+        self.__postings = {}
+        self.__memory = 0
+
+        self.__temp_dir = tempfile.mkdtemp(dir=temp_dir)
+        self.__runs = []
+        self.__runs_count = 0
+        self.__closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.__cleanup()
+
+    def __len__(self):
+        '''Retorna la cantidad de runs escritos en disco.
+
+        Returns:
+            len (int): cantidad de runs.
+        '''
+        return len(self.__runs)
+
+    def __check_open(self):
+        '''Lanza una excepción si el índice ya fue cerrado.'''
+        if self.__closed:
+            raise Exception("No es posible agregar postings: el índice ya "
+                            "fue cerrado.")
+
+    def add(self, term, docid):
+        '''Agrega un posting.
+
+        Args:
+            term (int): id de término.
+            docid (int): id de documento.
+        '''
+        self.__check_open()
+
+        docids = self.__postings.get(term)
+        if docids is None:
+            docids = self.__postings[term] = array("I")
+            self.__memory += TERM_BYTES
+
+        docids.append(docid)
+        self.__memory += POSTING_BYTES
+
+        if self.__memory >= self.__memory_budget:
+            self.__spill()
+
+    def add_postings(self, postings):
+        '''Agrega postings.
+
+        Args:
+            postings (iterable): tuplas de la forma (término, docid).
+        '''
+        self.__check_open()
+
+        for term, docid in postings:
+            self.add(term, docid)
+
+    def __sorted_postings(self, run):
+        '''Recorre las listas en memoria en orden de término, con sus docids
+        ordenados y sin duplicados. Cada lista se libera al recorrerla, por lo
+        que la memoria adicional al presupuesto es la de la lista ordenada
+        (de enteros de Python) del término actual.
+
+        Args:
+            run (int): índice de run asignado a las listas.
+
+        Returns:
+            lists (generator): tuplas de la forma (término, run, docids).
+        '''
+        for term in sorted(self.__postings):
+            yield term, run, sorted(set(self.__postings.pop(term)))
+
+    def __new_run_path(self):
+        '''Retorna la ruta de un nuevo run (de spill o intermedio).
+
+        Returns:
+            path (str): ruta del run.
+        '''
+        path = os.path.join(self.__temp_dir,
+                            "run{0}".format(self.__runs_count))
+        self.__runs_count += 1
+        return path
+
+    def __spill(self):
+        '''Escribe las listas en memoria en un nuevo run y las libera.'''
+        path = self.__new_run_path()
+        write_run(path, ((term, docids) for term, _, docids
+                         in self.__sorted_postings(len(self.__runs))))
+
+        self.__runs.append(path)
+        self.__postings = {}
+        self.__memory = 0
+
+    def __reduce_runs(self):
+        '''Combina los runs en pasadas de a lo sumo merge_fan_in runs
+        consecutivos (preservando el orden de los runs), hasta que queden
+        merge_fan_in o menos.'''
+        fan_in = self.__merge_fan_in
+        while len(self.__runs) > fan_in:
+            runs = []
+            for start in range(0, len(self.__runs), fan_in):
+                paths = self.__runs[start:start+fan_in]
+                if len(paths) == 1:
+                    runs.append(paths[0])
+                    continue
+
+                path = self.__new_run_path()
+                runs_lists = [read_run(run_path, run)
+                              for run, run_path in enumerate(paths)]
+                write_run(path, merge_runs(runs_lists))
+                for run_path in paths:
+                    os.remove(run_path)
+                runs.append(path)
+
+            self.__runs = runs
+
+    def close(self):
+        '''Combina los runs y las listas en memoria en el archivo de listas, y
+        elimina los runs.'''
+        if self.__closed:
+            return
+
+        try:
+            self.__reduce_runs()
+
+            runs = [read_run(path, run)
+                    for run, path in enumerate(self.__runs)]
+            runs.append(self.__sorted_postings(len(self.__runs)))
+
+            increasing = self.__codec in listcodec.INCREASING_CODECS
+            with PostingFileWriter(self.__path) as writer:
+                for term, docids in merge_runs(runs):
+                    if not increasing:
+                        docids = to_gaps(docids)
+                    writer.add(term, docids, self.__codec)
+        finally:
+            self.__cleanup()
+
+    def __cleanup(self):
+        '''Elimina los runs y libera las listas en memoria.'''
+        self.__closed = True
+        self.__postings = {}
+        shutil.rmtree(self.__temp_dir, ignore_errors=True)
+
+
+def build_index(postings, path, codec, memory_budget=MEMORY_BUDGET,
+                temp_dir=None, merge_fan_in=MERGE_FAN_IN):
+    '''Construye un archivo de listas codificadas a partir de postings (ver
+    IndexBuilder).
+
+    Args:
+        postings (iterable): tuplas de la forma (término, docid).
+        path (str): ruta del archivo de listas a construir.
+        codec (EncodeTypes): códec de las listas del archivo.
+        memory_budget (int): presupuesto (en bytes) de los postings en
+            memoria.
+        temp_dir (str): directorio en el que se crean los runs.
+        merge_fan_in (int): cantidad máxima de runs combinados en simultáneo.
+
+    Returns:
+        runs (int): cantidad de runs escritos en disco.
+    '''
+    with IndexBuilder(path, codec, memory_budget, temp_dir,
+                      merge_fan_in) as builder:
+        builder.add_postings(postings)
+        runs = len(builder)
+    return runs
+
+
+def main():
+    '''Prueba de funcionamiento de la clase IndexBuilder.'''
+    print("Prueba de construcción de índice de 1 millón de postings en "
+          "curso...")
+    random.seed(0)
+    postings = [(random.randint(0, 999), docid)
+                for docid in range(0, 100000) for _ in range(0, 10)]
+    expected = {}
+    for term, docid in postings:
+        expected.setdefault(term, set()).add(docid)
+
+    path = os.path.join(tempfile.mkdtemp(), "index.irpf")
+
+    # Build
+    start = time.time()
+    runs = build_index(postings, path, EncodeTypes.PForDelta, 1 << 20)
+    end = time.time()
+    build_time = end-start
+
+    with PostingFileReader(path) as reader:
+        for term in expected:
+            if read_docids(reader, term) != sorted(expected[term]):
+                print("ATENCIÓN: postings != decoded ({0}).".format(term))
+                return
+
+    print("Runs: {0}".format(runs))
+    print("Build time: {0}".format(build_time))
+
+    # Merge en múltiples pasadas (más runs que el fan-in).
+    runs = build_index(postings, path, EncodeTypes.PForDelta, 1 << 16, None,
+                       4)
+    with PostingFileReader(path) as reader:
+        for term in expected:
+            if read_docids(reader, term) != sorted(expected[term]):
+                print("ATENCIÓN: postings != decoded ({0}, fan-in 4).".format(
+                    term))
+                return
+
+    print("Runs (fan-in 4): {0}".format(runs))
+
+    # Índice con docid 0 (cero) para cada códec.
+    print("Prueba de construcción con docid 0 (cero) por códec en curso...")
+    postings = [(0, 0), (1, 0), (1, 1), (1, 7), (2, 3), (2, 0), (3, 5)]
+    expected = {0: [0], 1: [0, 1, 7], 2: [0, 3], 3: [5]}
+    for codec in listcodec.ENCODERS:
+        build_index(postings, path, codec)
+        with PostingFileReader(path) as reader:
+            for term in expected:
+                if read_docids(reader, term) != expected[term]:
+                    print("ATENCIÓN: postings != decoded ({0}, {1}).".format(
+                        codec, term))
+                    return
+    print("OK.")
+
+if __name__ == '__main__':
+    main()
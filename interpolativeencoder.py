@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+- Nombre: interpolativeencoder.py
+- Descripción: permite encode/decode de listas crecientes de enteros a/desde
+Binary Interpolative Coding (BIC).
+- Autor: Agustín González
+- Modificado: 16/10/26
+
+Nota: algoritmo basado en "Binary Interpolative Coding for Effective Index
+Compression" de Moffat y Stuiver.
+
+Funcionamiento básico: dada una lista estrictamente creciente de números cuyos
+valores se encuentran en el rango [lo, hi], se codifica el número central de
+la lista. Dado que la lista es estrictamente creciente, el número del índice
+m (de los índices [i, j]) se encuentra en [lo + (m-i), hi - (j-m)], por lo que
+se codifica en binario mínimo (truncado) según el tamaño de dicho rango. Luego
+se codifican, del mismo modo, la mitad izquierda en [lo, número - 1] y la mitad
+derecha en [número + 1, hi]. Los rangos que contienen exactamente tantos
+valores como números (por ejemplo, docids consecutivos) no requieren bits. La
+recursión se implementa con una pila explícita (sin límite de profundidad).
+
+encoded = [último número (VB)] + [números restantes en BIC]
+'''
+
+try:
+    # Relative import.
+    from . import bitutils
+    from . import vbencoder as vbenc
+    from .bitbytearray import BitWriter
+except:
+    # Import para ejecución 'directa' del script.
+    import time
+    import bitutils
+    import vbencoder as vbenc
+    from bitbytearray import BitWriter
+
+
+def __intervals(numbers):
+    '''Recorre la lista en el orden de codificación (pre-orden): para cada
+    número cuyo rango contiene más de un valor posible, retorna su valor
+    relativo al inicio del rango y el tamaño del rango menos 1. El último
+    número (codificado en el header) se utiliza como límite superior.
+
+    Args:
+        numbers (int list): números a codificar.
+
+    Returns:
+        intervals (generator): tuplas de la forma (valor relativo, rango).
+    '''
+    # Pila de sublistas pendientes: (índice i, índice j, lo, hi).
+    stack = [(0, len(numbers) - 2, 0, numbers[-1] - 1)]
+
+    while stack:
+        i, j, lo, hi = stack.pop()
+
+        # Sublista vacía o rango sin valores libres.
+        if i > j or hi - lo == j - i:
+            continue
+
+        m = (i + j) >> 1
+        number = numbers[m]
+        low = lo + (m - i)
+        yield number - low, hi - (j - m) - low
+
+        # Pre-orden: la mitad izquierda se codifica primero.
+        stack.append((m + 1, j, number + 1, hi))
+        stack.append((i, m - 1, lo, number - 1))
+
+
+def __minimal_binary(value, interval):
+    '''Retorna el código binario mínimo (truncado) de un valor: de los
+    interval+1 valores posibles, los primeros u se codifican con b-1 bits y
+    los restantes con b bits.
+
+    Args:
+        value (int): valor a codificar (de 0 a interval).
+        interval (int): tamaño del rango menos 1.
+
+    Returns:
+        code (int): código (como entero).
+        size (int): tamaño del código en bits.
+    '''
+    b = interval.bit_length()
+    u = (1 << b) - interval - 1
+    if value < u:
+        return value, b - 1
+    return value + u, b
+
+
+def compute_encoded_size(numbers):
+    '''Calcula el tamaño de codificación final de la lista dada.
+
+    Args:
+        numbers (int list): números a codificar.
+
+    Returns:
+        size (int): tamaño de codificación final en bits.
+    '''
+    if not numbers:
+        return 0
+
+    # Nota: n << 3 = n * 8
+    size = len(vbenc.encode(numbers[-1])) << 3
+    for value, interval in __intervals(numbers):
+        size += __minimal_binary(value, interval)[1]
+    return size
+
+
+def encode(numbers):
+    '''Codifica una lista estrictamente creciente de números a BIC.
+
+    Args:
+        numbers (int list): números a codificar.
+
+    Returns:
+        encoded (bytearray): números codificados.
+        padding (int): relleno (en bits) del último byte de la codificación.
+    '''
+    if not numbers:
+        return bytearray(), 0
+
+    writer = BitWriter(len(numbers))
+    for value, interval in __intervals(numbers):
+        code, size = __minimal_binary(value, interval)
+        writer.write_bits(code, size)
+
+    encoded = bytearray(vbenc.encode(numbers[-1]))
+    return encoded + writer.to_bytearray(), writer.padding()
+
+
+def decode(encoded, nums, offset=0):
+    '''Decodifica una lista codificada en BIC.
+
+    Args:
+        encoded (byte list): números codificados.
+        nums (int): cantidad de números a decodificar.
+        offset (int): nro. de bit de inicio de lectura (múltiplo de 8).
+
+    Returns:
+        decoded (int list): números decodificados.
+    '''
+    if nums <= 0:
+        return []
+
+    read = bitutils.read_binary_from_barray
+
+    decoded = [0] * nums
+    decoded[-1], offset = vbenc.decode_number(encoded, offset)
+
+    # Mismo recorrido que en __intervals.
+    stack = [(0, nums - 2, 0, decoded[-1] - 1)]
+
+    while stack:
+        i, j, lo, hi = stack.pop()
+
+        if i > j:
+            continue
+
+        # Rango sin valores libres: números consecutivos.
+        if hi - lo == j - i:
+            decoded[i:j+1] = range(lo, hi + 1)
+            continue
+
+        m = (i + j) >> 1
+        low = lo + (m - i)
+        interval = hi - (j - m) - low
+
+        # Binario mínimo: b-1 bits y, si el valor no es menor a u, un bit más.
+        b = interval.bit_length()
+        u = (1 << b) - interval - 1
+        value = read(encoded, offset, b - 1)
+        offset += b - 1
+        if value >= u:
+            value = ((value << 1) | read(encoded, offset, 1)) - u
+            offset += 1
+
+        number = low + value
+        decoded[m] = number
+
+        stack.append((m + 1, j, number + 1, hi))
+        stack.append((i, m - 1, lo, number - 1))
+
+    return decoded
+
+
+def main():
+    '''Prueba de funcionamiento de las funciones encode y decode.'''
+    print("Prueba de encode/decode de 1 millón de enteros en curso...")
+    numbers = list(range(0, 500000)) + list(range(500000, 5000000, 9))
+
+    # Encode
+    start = time.time()
+    encoded, _ = encode(numbers)
+    end = time.time()
+    encoded_time = end-start
+
+    # Decode
+    start = time.time()
+    decoded = decode(encoded, len(numbers))
+    end = time.time()
+    decoded_time = end-start
+
+    if numbers != decoded:
+        print(numbers[-5:], decoded[-5:])
+        print("ATENCIÓN: numbers != decoded.")
+        return
+
+    print("Encoded time: {0}".format(encoded_time))
+    print("Decoded time: {0}".format(decoded_time))
+
+if __name__ == '__main__':
+    main()
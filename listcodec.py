@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+- Nombre: listcodec.py
+- Descripción: permite encode/decode de listas de enteros a/desde secuencias de
+bytes con cualquiera de los códecs de 'EncodeTypes' (ver __init__.py).
+- Autor: Agustín González
+- Modificado: 16/10/26
+
+Funcionamiento básico: cada códec tiene su propia interfaz (algunos retornan
+bytes y padding, otros listas de enteros de 32 o 64 bits, etc.). Este módulo
+unifica dichas interfaces en encode(numbers, codec), que siempre retorna un
+bytearray, y en decode(encoded, nums, codec), que acepta cualquier objeto con
+protocolo buffer (bytes, bytearray, memoryview, mmap). Las codificaciones en
+enteros de Simple16, PFor y Simple-8b se almacenan como enteros little-endian
+(el orden nativo de la mayoría de las arquitecturas), por lo que decode los lee
+directamente desde el buffer mediante memoryview.cast, sin copia (en
+arquitecturas big-endian, o en Python 2, se leen con struct). Unario se
+utiliza en su versión no optimizada (permite codificar el 0).
+'''
+
+import struct
+import sys
+
+try:
+    # Relative import.
+    from . import EncodeTypes
+    from . import vbencoder
+    from . import unaryencoder
+    from . import gammaencoder
+    from . import eliasfanoencoder
+    from . import bitpackingencoder
+    from . import simple16encoder
+    from . import pforencoder
+    from . import partitionedeliasfanoencoder
+    from . import simple8bencoder
+    from . import groupvarintencoder
+    from . import streamvbyteencoder
+    from . import eliasdeltaencoder
+    from . import eliasomegaencoder
+    from . import riceencoder
+    from . import interpolativeencoder
+except:
+    # Import para ejecución 'directa' del script.
+    from __init__ import EncodeTypes
+    import vbencoder
+    import unaryencoder
+    import gammaencoder
+    import eliasfanoencoder
+    import bitpackingencoder
+    import simple16encoder
+    import pforencoder
+    import partitionedeliasfanoencoder
+    import simple8bencoder
+    import groupvarintencoder
+    import streamvbyteencoder
+    import eliasdeltaencoder
+    import eliasomegaencoder
+    import riceencoder
+    import interpolativeencoder
+
+# Formato struct de cada entero de los códecs que codifican en enteros.
+WORD_FORMATS = {EncodeTypes.Simple16: "I",
+                EncodeTypes.PForDelta: "I",
+                EncodeTypes.Simple8b: "Q"}
+
+# Indica si los enteros almacenados (little-endian) pueden leerse como vista
+# del buffer (memoryview.cast utiliza el orden nativo de la arquitectura).
+NATIVE_WORDS = sys.byteorder == "little" and hasattr(memoryview, "cast")
+
+# Códecs que requieren listas crecientes (por ejemplo, docids): el resto
+# admite cualquier lista de enteros (por ejemplo, gaps de docids).
+INCREASING_CODECS = frozenset([EncodeTypes.EliasFano,
+                               EncodeTypes.PartitionedEliasFano,
+                               EncodeTypes.Interpolative])
+
+# Funciones de codificación por códec (retornan la codificación 'nativa').
+ENCODERS = {
+    EncodeTypes.VariableByte: vbencoder.encode_list,
+    EncodeTypes.Unary: lambda numbers: unaryencoder.encode_list(numbers,
+                                                                False)[0],
+    EncodeTypes.Gamma: lambda numbers: gammaencoder.encode_list(numbers)[0],
+    EncodeTypes.EliasFano: lambda numbers: eliasfanoencoder.encode(numbers)[0],
+    EncodeTypes.BitPacking: lambda numbers: bitpackingencoder.encode(
+        numbers)[0],
+    EncodeTypes.Simple16: simple16encoder.encode,
+    EncodeTypes.PForDelta: pforencoder.encode,
+    EncodeTypes.PartitionedEliasFano: partitionedeliasfanoencoder.encode,
+    EncodeTypes.Simple8b: simple8bencoder.encode,
+    EncodeTypes.GroupVarint: groupvarintencoder.encode,
+    EncodeTypes.StreamVByte: streamvbyteencoder.encode,
+    EncodeTypes.EliasDelta: lambda numbers: eliasdeltaencoder.encode_list(
+        numbers)[0],
+    EncodeTypes.EliasOmega: lambda numbers: eliasomegaencoder.encode_list(
+        numbers)[0],
+    EncodeTypes.Rice: lambda numbers: riceencoder.encode(numbers)[0],
+    EncodeTypes.Interpolative: lambda numbers: interpolativeencoder.encode(
+        numbers)[0]}
+
+# Funciones de decodificación por códec (de la forma f(encoded, nums)).
+DECODERS = {
+    EncodeTypes.VariableByte: vbencoder.decode,
+    EncodeTypes.Unary: lambda encoded, nums: unaryencoder.decode(encoded, nums,
+                                                                 False),
+    EncodeTypes.Gamma: gammaencoder.decode,
+    EncodeTypes.EliasFano: eliasfanoencoder.decode,
+    EncodeTypes.BitPacking: bitpackingencoder.decode,
+    EncodeTypes.Simple16: simple16encoder.decode,
+    EncodeTypes.PForDelta: pforencoder.decode,
+    EncodeTypes.PartitionedEliasFano: partitionedeliasfanoencoder.decode,
+    EncodeTypes.Simple8b: simple8bencoder.decode,
+    EncodeTypes.GroupVarint: groupvarintencoder.decode,
+    EncodeTypes.StreamVByte: streamvbyteencoder.decode,
+    EncodeTypes.EliasDelta: eliasdeltaencoder.decode,
+    EncodeTypes.EliasOmega: eliasomegaencoder.decode,
+    EncodeTypes.Rice: riceencoder.decode,
+    EncodeTypes.Interpolative: interpolativeencoder.decode}
+
+
+def __check_codec(codec):
+    '''Verifica que el códec dado se encuentre implementado.
+
+    Args:
+        codec (EncodeTypes): códec a verificar.
+    '''
+    if codec not in ENCODERS:
+        raise Exception("Códec no soportado: {0}.".format(codec))
+
+
+def encode(numbers, codec):
+    '''Codifica una lista de números con el códec dado.
+
+    Args:
+        numbers (int list): números a codificar.
+        codec (EncodeTypes): códec a utilizar.
+
+    Returns:
+        encoded (bytearray): números codificados.
+    '''
+    __check_codec(codec)
+    if not numbers:
+        return bytearray()
+
+    encoded = ENCODERS[codec](numbers)
+
+    # Códecs que codifican en enteros: conversión a bytes.
+    if codec in WORD_FORMATS:
+        return bytearray(struct.pack("<{0}{1}".format(len(encoded),
+                                                      WORD_FORMATS[codec]),
+                                     *encoded))
+
+    return bytearray(encoded)
+
+
+def decode(encoded, nums, codec):
+    '''Decodifica una lista de números codificada con el códec dado.
+
+    Args:
+        encoded (bytes): números codificados (cualquier objeto con protocolo
+            buffer).
+        nums (int): cantidad de números a decodificar.
+        codec (EncodeTypes): códec utilizado en la codificación.
+
+    Returns:
+        decoded (int list): números decodificados.
+    '''
+    __check_codec(codec)
+    if nums <= 0:
+        return []
+
+    if codec not in WORD_FORMATS:
+        return DECODERS[codec](encoded, nums)
+
+    # Códecs que codifican en enteros: vista de enteros del buffer (sin
+    # copia), liberada al finalizar la decodificación (para no retener el
+    # buffer, por ejemplo, un archivo mapeado en memoria).
+    word_format = WORD_FORMATS[codec]
+    if NATIVE_WORDS:
+        words = memoryview(encoded).cast("B").cast(word_format)
+        try:
+            return DECODERS[codec](words, nums)
+        finally:
+            words.release()
+
+    # Lectura de enteros (copia) desde el buffer.
+    count = len(encoded) // struct.calcsize(word_format)
+    words = struct.unpack_from("<{0}{1}".format(count, word_format), encoded)
+    return DECODERS[codec](words, nums)
@@ -0,0 +1,452 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+- Nombre: partitionedeliasfanoencoder.py
+- Descripción: permite encode/decode de enteros a/desde Partitioned Elias Fano
+(EF Multinivel).
+- Autor: Agustín González
+- Modificado: 16/10/26
+
+Nota: algoritmo basado en "Partitioned Elias-Fano Indexes" de Ottaviano y
+Venturini (https://bit.ly/2qNiFDg) y en su implementación en el repositorio
+GitHub de @ot: https://github.com/ot/partitioned_elias_fano.
+
+Funcionamiento básico: dada N una lista estrictamente creciente de números,
+N se subdivide en chunks (particiones) consecutivos. Siendo U_i el último
+número del chunk i, cada número n del chunk se codifica como n-(U_{i-1}+1),
+es decir, en relación al último número del chunk anterior (con U_{-1}=-1),
+por lo que su universo es u_i=U_i-U_{i-1}. Para cada chunk se utiliza la
+representación de menor tamaño entre:
+1. Rango implícito: si el chunk contiene todos los números de su universo,
+   no requiere bits.
+2. Vector característico: u_i bits.
+3. Elias Fano: l bits bajos por número + upper bits en unario.
+Los chunks se definen mediante un particionado (aproximadamente) óptimo por
+programación dinámica, según el tamaño de codificación de cada chunk (ver
+__find_partition). El nivel superior contiene las secuencias de U_i y de la
+cantidad acumulada de números por chunk, ambas codificadas en Elias Fano (ver
+eliasfanoencoder.py). Dado que el tipo y el tamaño de cada chunk dependen
+únicamente de su cantidad de números y de su universo, no es necesario
+almacenarlos: se recalculan al decodificar.
+
+encoded = [cant. de chunks] + [U] + [cantidades] + [chunks]
+'''
+
+import bisect
+
+try:
+    # Relative import.
+    from . import bitutils
+    from . import unaryencoder
+    from . import vbencoder as vbenc
+    from . import eliasfanoencoder as efenc
+    from .bitbytearray import BitWriter
+except:
+    # Import para ejecución 'directa' del script.
+    import time
+    import bitutils
+    import unaryencoder
+    import vbencoder as vbenc
+    import eliasfanoencoder as efenc
+    from bitbytearray import BitWriter
+
+# Tipos de representación de chunk.
+RANGE_CHUNK = 0
+BV_CHUNK = 1
+EF_CHUNK = 2
+
+# Granularidad (en cantidad de números) de los límites de chunk evaluados
+# por el particionado.
+PARTITION_GRANULARITY = 32
+
+# Tamaños de chunk evaluados, en múltiplos de la granularidad (32 a 8192).
+PARTITION_LENGTHS = [1 << x for x in range(0, 9)]
+
+# Costo fijo estimado (en bits) de cada chunk en el nivel superior.
+CHUNK_OVERHEAD = 64
+
+
+def chunk_encoding(size, universe):
+    '''Retorna la representación de menor tamaño para un chunk.
+
+    Args:
+        size (int): cantidad de números del chunk.
+        universe (int): universo del chunk (números en [0, universe)).
+
+    Returns:
+        chunk_type (int): tipo de representación (RANGE, BV o EF_CHUNK).
+        bits (int): tamaño de la codificación en bits.
+        l (int): bits bajos por número (sólo para EF_CHUNK, en otro caso 0).
+    '''
+    # 1. Rango implícito.
+    if size == universe:
+        return RANGE_CHUNK, 0, 0
+
+    # 2. Elias Fano: l = floor(log2(u/n)).
+    l = (universe // size).bit_length() - 1
+    ef_bits = size*l + size + ((universe - 1) >> l)
+
+    # 3. Vector característico.
+    if universe <= ef_bits:
+        return BV_CHUNK, universe, 0
+
+    return EF_CHUNK, ef_bits, l
+
+
+def __find_partition(numbers):
+    '''Halla un particionado aproximadamente óptimo de la lista dada, mediante
+    programación dinámica. Se trata de una aproximación ya que sólo se evalúan
+    límites de chunk múltiplos de PARTITION_GRANULARITY y tamaños de chunk de
+    PARTITION_LENGTHS (progresión geométrica).
+
+    Args:
+        numbers (int list): números a codificar.
+
+    Returns:
+        ends (int list): índice (exclusivo) de fin de cada chunk.
+    '''
+    size = len(numbers)
+
+    # Límites de chunk candidatos.
+    points = list(range(0, size, PARTITION_GRANULARITY)) + [size]
+    last = len(points) - 1
+
+    # Costo mínimo hasta cada límite y límite previo del mismo.
+    costs = [0] + [None]*last
+    previous = [0]*len(points)
+
+    for start in range(0, last):
+        first = points[start]
+        base = numbers[first-1]+1 if first > 0 else 0
+
+        for length in PARTITION_LENGTHS:
+            end = min(start + length, last)
+            chunk_size = points[end] - first
+            universe = numbers[points[end]-1] - base + 1
+
+            cost = costs[start] + CHUNK_OVERHEAD + \
+                chunk_encoding(chunk_size, universe)[1]
+            if costs[end] is None or cost < costs[end]:
+                costs[end] = cost
+                previous[end] = start
+
+            if end == last:
+                break
+
+    # Reconstrucción de particionado desde el último límite.
+    ends = []
+    point = last
+    while point > 0:
+        ends.append(points[point])
+        point = previous[point]
+
+    return list(reversed(ends))
+
+
+def __encode_chunk(writer, chunk, base, universe):
+    '''Codifica un chunk según su representación de menor tamaño.
+
+    Args:
+        writer (BitWriter): writer sobre el que se escribirá la codificación.
+        chunk (int list): números del chunk.
+        base (int): número a restar a cada número del chunk.
+        universe (int): universo del chunk.
+    '''
+    chunk_type, _, l = chunk_encoding(len(chunk), universe)
+
+    # 1. Rango implícito: sin escritura.
+    if chunk_type == RANGE_CHUNK:
+        return
+
+    # 2. Vector característico (ver eliasfanoencoder.bv_encode): dado que el
+    # último número del chunk es base + universe - 1, el vector es de
+    # universe bits (más el relleno de su último byte, que no se escribe).
+    if chunk_type == BV_CHUNK:
+        vector, padding = efenc.bv_encode(chunk, base)
+        for i in range(0, len(vector) - 1):
+            writer.write_bits(vector[i], 8)
+        writer.write_bits(vector[-1] >> padding, 8 - padding)
+        return
+
+    # 3. Elias Fano: lower bits y gaps de upper bits en unario.
+    mask = (1 << l) - 1
+    for number in chunk:
+        writer.write_bits((number - base) & mask, l)
+
+    previous_upper = 0
+    for number in chunk:
+        upper = (number - base) >> l
+        writer.write_unary(upper - previous_upper)
+        previous_upper = upper
+
+
+def encode(numbers):
+    '''Codifica una lista estrictamente creciente de números a Partitioned
+    Elias Fano.
+
+    Args:
+        numbers (int list): números a codificar.
+
+    Returns:
+        encoded (bytearray): números codificados.
+    '''
+    ends = __find_partition(numbers)
+
+    # Nivel superior: último número y cantidad acumulada de cada chunk.
+    endpoints = [numbers[end-1] for end in ends]
+    encoded_endpoints = bytearray(efenc.encode(endpoints)[0])
+    encoded_ends = bytearray(efenc.encode(ends)[0])
+
+    encoded = bytearray(vbenc.encode(len(ends)))
+    encoded += bytearray(vbenc.encode(len(encoded_endpoints)))
+    encoded += encoded_endpoints
+    encoded += bytearray(vbenc.encode(len(encoded_ends)))
+    encoded += encoded_ends
+
+    # Chunks.
+    writer = BitWriter(len(numbers))
+    start = 0
+    base = 0
+    for end in ends:
+        universe = numbers[end-1] - base + 1
+        __encode_chunk(writer, numbers[start:end], base, universe)
+        start = end
+        base = numbers[end-1] + 1
+
+    return encoded + writer.to_bytearray()
+
+
+def decode_chunk(encoded, offset, size, base, universe):
+    '''Decodifica un chunk.
+
+    Args:
+        encoded (byte list): números codificados.
+        offset (int): nro. de bit de inicio del chunk.
+        size (int): cantidad de números del chunk.
+        base (int): número a sumar a cada número del chunk.
+        universe (int): universo del chunk.
+
+    Returns:
+        decoded (int list): números decodificados.
+    '''
+    chunk_type, _, l = chunk_encoding(size, universe)
+
+    # 1. Rango implícito.
+    if chunk_type == RANGE_CHUNK:
+        return list(range(base, base + universe))
+
+    # 2. Vector característico: lectura byte a byte (según tabla de 1s).
+    if chunk_type == BV_CHUNK:
+        decoded = []
+        end = offset + universe
+        byte_index = offset >> 3
+        while len(decoded) < size:
+            # Número correspondiente al primer bit del byte.
+            number = base + (byte_index << 3) - offset
+            byte = encoded[byte_index]
+            for i in efenc.SELECT_ONES[byte]:
+                position = (byte_index << 3) + i
+                if offset <= position < end:
+                    decoded.append(number + i)
+            byte_index += 1
+        return decoded
+
+    # 3. Elias Fano.
+    upper_offset = offset + size*l
+    uppers = unaryencoder.decode(encoded, size, False, upper_offset)
+
+    decoded = []
+    upper = 0
+    for gap in uppers:
+        upper += gap
+        lower = bitutils.read_binary_from_barray(encoded, offset, l)
+        decoded.append(base + (upper << l) + lower)
+        offset += l
+
+    return decoded
+
+
+class PartitionedEliasFanoReader(object):
+    '''Permite la lectura de una lista codificada en Partitioned Elias Fano.
+    Al inicializarse, sólo decodifica el nivel superior (un número por chunk):
+    cada chunk se decodifica recién al ser accedido. El último chunk leído se
+    mantiene decodificado, por lo que lecturas consecutivas (por ejemplo,
+    búsquedas next_geq crecientes en una intersección) no lo decodifican
+    nuevamente.'''
+
+    def __init__(self, encoded, nums, offset=0):
+        '''Inicializa clase.
+
+        Args:
+            encoded (byte list): números codificados (ver encode).
+            nums (int): cantidad de números de la codificación.
+            offset (int): nro. de bit de inicio de la codificación (múltiplo
+                de 8) en encoded. Tanto el nivel superior como los chunks se
+                leen directamente desde encoded, sin copiarlo.
+        '''
+        self.__encoded = encoded
+        self.__nums = nums
+
+        # Nivel superior. Nota: n << 3 = n * 8
+        chunks, offset = vbenc.decode_number(encoded, offset)
+
+        size, offset = vbenc.decode_number(encoded, offset)
+        self.__endpoints = efenc.decode(encoded, chunks, offset)
+        offset += size << 3
+
+        size, offset = vbenc.decode_number(encoded, offset)
+        self.__ends = efenc.decode(encoded, chunks, offset)
+        offset += size << 3
+
+        # Offset (en bits) de cada chunk, según tamaño de los anteriores.
+        self.__offsets = []
+        for chunk in range(0, chunks):
+            self.__offsets.append(offset)
+            size, base, universe = self.__chunk_bounds(chunk)
+            offset += chunk_encoding(size, universe)[1]
+
+        # Último chunk decodificado.
+        self.__chunk = None
+        self.__chunk_numbers = None
+
+    def __len__(self):
+        '''Retorna la cantidad de números de la codificación.
+
+        Returns:
+            len (int): cantidad de números.
+        '''
+        return self.__nums
+
+    def __chunk_bounds(self, chunk):
+        '''Retorna los parámetros de un chunk.
+
+        Args:
+            chunk (int): índice de chunk.
+
+        Returns:
+            size (int): cantidad de números del chunk.
+            base (int): número base del chunk.
+            universe (int): universo del chunk.
+        '''
+        if chunk == 0:
+            start = 0
+            base = 0
+        else:
+            start = self.__ends[chunk-1]
+            base = self.__endpoints[chunk-1] + 1
+
+        size = self.__ends[chunk] - start
+        universe = self.__endpoints[chunk] - base + 1
+        return size, base, universe
+
+    def chunks(self):
+        '''Retorna la cantidad de chunks de la codificación.
+
+        Returns:
+            chunks (int): cantidad de chunks.
+        '''
+        return len(self.__offsets)
+
+    def read_chunk(self, chunk):
+        '''Decodifica un chunk (o retorna el último chunk decodificado).
+
+        Args:
+            chunk (int): índice de chunk.
+
+        Returns:
+            decoded (int list): números del chunk.
+        '''
+        if chunk != self.__chunk:
+            size, base, universe = self.__chunk_bounds(chunk)
+            self.__chunk_numbers = decode_chunk(self.__encoded,
+                                                self.__offsets[chunk], size,
+                                                base, universe)
+            self.__chunk = chunk
+
+        return self.__chunk_numbers
+
+    def access(self, index):
+        '''Retorna el número del índice dado.
+
+        Args:
+            index (int): índice del número (desde 0).
+
+        Returns:
+            number (int): número de la lista.
+        '''
+        if index < 0 or index >= self.__nums:
+            raise IndexError("Índice fuera de rango.")
+
+        chunk = bisect.bisect_right(self.__ends, index)
+        start = self.__ends[chunk-1] if chunk > 0 else 0
+        return self.read_chunk(chunk)[index - start]
+
+    def next_geq(self, number):
+        '''Busca el primer número de la lista mayor o igual al dado.
+
+        Args:
+            number (int): número a buscar.
+
+        Returns:
+            index (int): índice del número hallado (o cantidad de números de la
+                lista, si no existe).
+            found (int): número hallado (o None, si no existe).
+        '''
+        # Primer chunk cuyo último número es mayor o igual al buscado.
+        chunk = bisect.bisect_left(self.__endpoints, number)
+        if chunk == len(self.__endpoints):
+            return self.__nums, None
+
+        numbers = self.read_chunk(chunk)
+        position = bisect.bisect_left(numbers, number)
+        start = self.__ends[chunk-1] if chunk > 0 else 0
+        return start + position, numbers[position]
+
+
+def decode(encoded, nums, offset=0):
+    '''Decodifica una lista codificada en Partitioned Elias Fano.
+
+    Args:
+        encoded (byte list): números codificados.
+        nums (int): cantidad de números a decodificar.
+        offset (int): nro. de bit de inicio de lectura (múltiplo de 8).
+
+    Returns:
+        decoded (int list): números decodificados.
+    '''
+    reader = PartitionedEliasFanoReader(encoded, nums, offset)
+
+    decoded = []
+    for chunk in range(0, reader.chunks()):
+        decoded.extend(reader.read_chunk(chunk))
+
+    return decoded
+
+
+def main():
+    '''Prueba de funcionamiento de las funciones encode y decode.'''
+    print("Prueba de encode/decode de 1 millón de enteros en curso...")
+    numbers = list(range(0, 5000000, 5))
+
+    # Encode
+    start = time.time()
+    encoded = encode(numbers)
+    end = time.time()
+    encoded_time = end-start
+
+    # Decode
+    start = time.time()
+    decoded = decode(encoded, len(numbers))
+    end = time.time()
+    decoded_time = end-start
+
+    if numbers != decoded:
+        print(numbers[-5:], decoded[-5:])
+        print("ATENCIÓN: numbers != decoded.")
+        return
+
+    print("Encoded time: {0}".format(encoded_time))
+    print("Decoded time: {0}".format(decoded_time))
+
+if __name__ == '__main__':
+    main()
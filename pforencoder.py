@@ -5,7 +5,7 @@
 - Descripción: permite encode/decode de paquetes de enteros a/desde PFor
 (NewPFor/OptPFor).
 - Autor: Agustín González
-- Modificado: 30/05/18
+- Modificado: 16/10/26
 
 Nota: algoritmo basado en "Performance of Compressed Inverted List Caching
 in Search Engines" de Zhang, Long y Suel y en implementación kamikaze de los
@@ -28,6 +28,15 @@ Siendo N una lista de números:
 4. Se comprime IE utilizando S16.
 5. Se almacena el número b y la cantidad de excepciones en H (32 bits).
 6. encoded = [H] + C + IE
+
+PFor en bloques (ver encode_blocks): dada D una lista creciente de docids, D
+se subdivide en bloques de BLOCK_SIZE números, cada uno codificado como una
+codificación PFor independiente (con su propio header) de sus d-gaps. Los
+bloques se preceden por un directorio que contiene, para cada bloque, su
+último docid y su offset (en enteros) relativo al inicio de los bloques. De
+este modo, la decodificación de un rango de bloques o la búsqueda del primer
+docid mayor o igual a uno dado (next_geq) sólo requieren la lectura de los
+bloques involucrados.
 '''
 
 import math
@@ -35,12 +44,14 @@ import math
 try:
     # Relative import.
     from . import simple16encoder
+    from . import gapsencoder as gapsenc
     from .bitutils import read_binary_from_iarray
     from .bitutils import write_binary_in_iarray
 except:
     # Import para ejecución 'directa' del script.
     import time
     import simple16encoder
+    import gapsencoder as gapsenc
     from bitutils import read_binary_from_iarray, write_binary_in_iarray
 
 # Posibles 'b'.
@@ -58,6 +69,25 @@ HEADER_SIZE = 32
 # Tamaño máximo de B en header (bit).
 B_HEADER_SIZE = 5
 
+# Máximo de bits de una excepción (los bits altos se codifican en S16).
+MAX_EXCEPTION_BITS = 28
+
+# Cantidad de números por bloque (PFor en bloques, ver encode_blocks).
+BLOCK_SIZE = 128
+
+# Tamaño (en enteros) de cada entrada del directorio de bloques.
+BLOCK_ENTRY_SIZE = 2
+
+# Fracción de un lote S16 (entero de 32 bits) ocupada por un número según su
+# cantidad de bits requeridos (índice, de 0 a MAX_EXCEPTION_BITS): la inversa
+# de la máxima cantidad de slots de un formato S16 en el que todos los slots
+# admiten dicha cantidad de bits. Se utiliza para estimar el tamaño de las
+# excepciones de cada b (ver __find_optimal_b_opt).
+S16_NUMBER_COSTS = [1.0 / max(len(slots)
+                              for slots in simple16encoder.S16_FORMATS.values()
+                              if min(slots) >= max(bits, 1))
+                    for bits in range(0, MAX_EXCEPTION_BITS + 1)]
+
 
 def estimate_encoded_size(numbers, b):
     '''Estima el tamaño de codificación para la lista y el b dados. Se presupone
@@ -88,9 +118,60 @@ def estimate_encoded_size(numbers, b):
     return size
 
 
+def compute_encoded_size(numbers, b):
+    '''Calcula el tamaño de codificación final para la lista y el b dados, es
+    decir, teniendo en cuenta el tamaño real de las excepciones (índices y bits
+    altos comprimidos en S16).
+
+    Args:
+        numbers (int list): números a codificar.
+        b (int): cantidad de bits a utilizar por número.
+
+    Returns:
+        size (int): tamaño de codificación final en bits.
+    '''
+    # Máximo número posible con b.
+    max_number = MASKS[b]
+
+    # Tamaño de header y slots (en enteros de 32 bits completos).
+    # Nota: n << 5 = n * 32
+    size = HEADER_SIZE + (int(math.ceil(len(numbers)*b/32.0)) << 5)
+
+    # Índices y bits altos de las excepciones.
+    exceptions_indexes = []
+    exceptions = []
+    for i in range(0, len(numbers)):
+        if numbers[i] > max_number:
+            exceptions_indexes.append(i)
+            exceptions.append(numbers[i] >> b)
+
+    size += simple16encoder.compute_encoded_size(exceptions_indexes +
+                                                 exceptions)
+    return size
+
+
+def __bits_histogram(numbers):
+    '''Retorna el histograma de bits requeridos (bit_length) de los números.
+
+    Args:
+        numbers (int list): números a codificar.
+
+    Returns:
+        histogram (int list): cantidad de números por cantidad de bits
+            requeridos (índices de 0 a 32).
+    '''
+    histogram = [0] * (POSSIBLES_B[-1] + 1)
+    for number in numbers:
+        histogram[number.bit_length()] += 1
+    return histogram
+
+
 def __find_optimal_b(numbers):
     '''Halla el b óptimo (cantidad de bits a utilizar por slot) en base a la lista
-    de números pasada por parámetro.
+    de números pasada por parámetro. El resultado es equivalente al de evaluar
+    estimate_encoded_size para cada b posible, aunque la lista se recorre una
+    única vez: la cantidad de excepciones de cada b se obtiene de la suma de
+    las frecuencias del histograma de bits requeridos mayores a b.
 
     Args:
         numbers (int list): números a codificar.
@@ -99,37 +180,140 @@ def __find_optimal_b(numbers):
         b (int): cantidad de bits óptima a utilizar para cada elemento de la
             lista de números a codificar.
     '''
-    optimal_b = POSSIBLES_B[0]
+    histogram = __bits_histogram(numbers)
+
+    optimal_b = None
+    optimal_size = None
 
-    # Estimación de tamaño de compresión en base a b.
-    optimal_size = estimate_encoded_size(numbers, optimal_b)
+    # Excepciones (números de más de b bits) para el b evaluado.
+    exception_count = len(numbers) - histogram[0]
 
     # Selección del mejor b.
-    for i in range(1, len(POSSIBLES_B)):
-        current_b = POSSIBLES_B[i]
+    for current_b in POSSIBLES_B:
+        exception_count -= histogram[current_b]
 
-        # Tamaño para b actual.
-        current_size = estimate_encoded_size(numbers, current_b)
+        # Tamaño para b actual (ver estimate_encoded_size).
+        current_size = HEADER_SIZE + len(numbers)*current_b
+        current_size += exception_count*32
 
         # ¿Es el b calculado mejor que el óptimo hasta el momento?
-        if current_size < optimal_size:
+        if optimal_size is None or current_size < optimal_size:
             optimal_b = current_b
             optimal_size = current_size
 
     return optimal_b
 
 
-def encode(numbers):
-    '''Codifica una lista de números a PFor (NewPFor).
+def __find_optimal_b_opt(numbers):
+    '''Halla el b óptimo según el tamaño real de codificación (OptPFor): los b
+    se ordenan por un tamaño estimado desde el histograma de bits, y sólo se
+    calcula el tamaño real (compute_encoded_size) de aquellos cuya cota
+    inferior aún puede superar al óptimo. Nota: no es una única pasada, ya
+    que se calcula el tamaño real de cada b no descartado (uno en listas
+    uniformes o geométricas, varios en listas de tamaños mixtos).
 
     Args:
         numbers (int list): números a codificar.
 
+    Returns:
+        b (int): cantidad de bits óptima a utilizar para cada elemento de la
+            lista de números a codificar.
+    '''
+    costs = S16_NUMBER_COSTS
+
+    # Histograma de bits requeridos, y costo S16 estimado y bits (al menos 1,
+    # como en S16) de los índices por cantidad de bits requeridos. Los
+    # índices se recorren en tramos de igual cantidad de bits ([0, 1), [1, 2),
+    # [2, 4), [4, 8)...), por lo que sus totales se obtienen del histograma de
+    # cada tramo.
+    histogram = [0] * (POSSIBLES_B[-1] + 1)
+    indexes_costs = [0.0] * (POSSIBLES_B[-1] + 1)
+    indexes_bits = [0] * (POSSIBLES_B[-1] + 1)
+    start = 0
+    while start < len(numbers):
+        end = max(start << 1, 1)
+        index_cost = costs[start.bit_length()]
+        index_bits = max(start.bit_length(), 1)
+
+        segment_histogram = __bits_histogram(numbers[start:end])
+        for bits in range(0, len(histogram)):
+            histogram[bits] += segment_histogram[bits]
+            indexes_costs[bits] += segment_histogram[bits]*index_cost
+            indexes_bits[bits] += segment_histogram[bits]*index_bits
+
+        start = end
+
+    # Máximo de bits requeridos por los números de la lista.
+    max_bits = max(i for i in range(0, len(histogram)) if histogram[i]) \
+        if numbers else 0
+
+    # Cantidades de bits requeridos presentes en la lista.
+    present_bits = [bits for bits in range(0, max_bits + 1) if histogram[bits]]
+
+    # Tamaño estimado y cota inferior de tamaño de cada b. Dado un b, las
+    # excepciones son los números de k > b bits, cuyos bits altos requieren
+    # exactamente k - b bits: el tamaño estimado surge de S16_NUMBER_COSTS, y
+    # la cota inferior, de que cada lote S16 contiene a lo sumo 28 bits de
+    # datos. Los b mayores a max_bits no generan excepciones, pero sí más
+    # slots, por lo que no se evalúan. A su vez, los bits altos de cada
+    # excepción deben poder codificarse en S16 (b >= max_bits -
+    # MAX_EXCEPTION_BITS).
+    candidates = []
+    min_b = max(max_bits - MAX_EXCEPTION_BITS, 1)
+    for b in range(min_b, max(max_bits, 1) + 1):
+        exceptions_cost = 0.0
+        exceptions_bits = 0
+        for bits in present_bits:
+            if bits > b:
+                exceptions_cost += indexes_costs[bits] + \
+                    histogram[bits]*costs[bits - b]
+                exceptions_bits += indexes_bits[bits] + \
+                    histogram[bits]*(bits - b)
+
+        # Tamaño de header y slots (en enteros completos).
+        # Nota: n << 5 = n * 32
+        size = HEADER_SIZE + (int(math.ceil(len(numbers)*b/32.0)) << 5)
+
+        estimated = size + (int(math.ceil(exceptions_cost)) << 5)
+        bound = size + (int(math.ceil(exceptions_bits/28.0)) << 5)
+        candidates.append((estimated, b, bound))
+
+    # Evaluación en orden creciente de tamaño estimado: sólo se calcula el
+    # tamaño real de los b cuya cota inferior no supera al óptimo hasta el
+    # momento.
+    optimal_b = None
+    optimal_size = None
+    for _, b, bound in sorted(candidates):
+        if optimal_size is not None and bound > optimal_size:
+            continue
+
+        size = compute_encoded_size(numbers, b)
+        if optimal_size is None or (size, b) < (optimal_size, optimal_b):
+            optimal_b = b
+            optimal_size = size
+
+    return optimal_b
+
+
+def encode(numbers, opt_pfor=False):
+    '''Codifica una lista de números a PFor (NewPFor u OptPFor).
+
+    Args:
+        numbers (int list): números a codificar.
+        opt_pfor (bool): en False (por omisión), el b se selecciona según el
+            tamaño estimado de codificación (NewPFor, ver
+            estimate_encoded_size). En True, según el tamaño real (OptPFor,
+            ver compute_encoded_size), lo cual es más costoso pero resulta
+            en codificaciones de menor (o igual) tamaño.
+
     Returns
         encoded(int list): lista de números codificada.
     '''
     # Parámetro b (máx número de bits por elemento)
-    b = __find_optimal_b(numbers)
+    if opt_pfor:
+        b = __find_optimal_b_opt(numbers)
+    else:
+        b = __find_optimal_b(numbers)
 
     # Lista de excepciones.
     exceptions = []
@@ -191,21 +375,22 @@ def encode(numbers):
     return encoded
 
 
-def __get_header(encoded):
+def __get_header(encoded, offset=0):
     '''Retorna datos de header de la codificación dado.
 
     Args:
         encoded (int list): números codificados.
+        offset (int): índice del header en encoded.
 
     Returns:
         bits (int): cantidad de bits utilizados por slot.
         exceptions_count (int): cantidad de excepciones en la codificación.
     '''
-    offset = 32 - B_HEADER_SIZE
+    shift = 32 - B_HEADER_SIZE
 
     # Param b+1, ya que se resta 1 en encode.
-    bits = (encoded[0] >> offset)+1
-    exceptions_count = encoded[0] & MASKS[offset]
+    bits = (encoded[offset] >> shift)+1
+    exceptions_count = encoded[offset] & MASKS[shift]
 
     return bits, exceptions_count
 
@@ -236,45 +421,192 @@ def __merge_exceptions(decoded, exceptions, b):
     return decoded
 
 
-def decode(encoded, nums):
-    '''Decodifica una secuencia de enteros codificada en PFor (NewPFor).
+def decode(encoded, nums, offset=0, prefix_sum=False, base=0):
+    '''Decodifica una secuencia de enteros codificada en PFor (NewPFor). La
+    codificación se lee directamente desde el índice dado, sin copiar
+    encoded.
 
     Args:
-        encoded (int list): números codificados.
+        encoded (int list): números codificados (lista o cualquier secuencia
+            de enteros de 32 bits, como array('I') o memoryview).
         nums (int): cantidad de números a decodificar.
+        offset (int): índice de inicio (header) de la codificación en encoded.
+        prefix_sum (bool): indica si los números decodificados son gaps, en
+            cuyo caso se retorna su suma acumulada desde base (ver
+            gapsencoder.prefix_sum). Por omisión, en False.
+        base (int): número desde el que se acumulan los gaps.
 
     Returns:
         decoded (int list): números decodificados.
     '''
     # Obtención de header.
-    header = __get_header(encoded)
+    header = __get_header(encoded, offset)
     b = header[0]
     exceptions_count = header[1]
 
-    # Eliminación de header.
-    encoded = encoded[1:]
     decoded = []
 
-    # > 1° fase de decodificación: batch decode (más rápida).
-    offset = 0
+    # > 1° fase de decodificación: batch decode (más rápida). Los slots
+    # comienzan luego del header. Nota: n << 5 = n * 32
+    bit_offset = (offset + 1) << 5
     for _ in range(0, nums):
-        decoded.append(read_binary_from_iarray(encoded, offset, b))
-        offset += b
+        decoded.append(read_binary_from_iarray(encoded, bit_offset, b))
+        bit_offset += b
 
     # > 2° fase de decodificación (más lenta): excepciones.
     if exceptions_count > 0:
-        ints_readed = int(math.ceil(offset/32))
-        exceptions = encoded[ints_readed:]
-        exceptions = simple16encoder.decode(exceptions)
-
-        # Eliminación de posibles 0s decodificados (x2 ya que se almacenan
-        # índices y excepciones). Nota: n*2 = n << 1
-        exceptions = exceptions[0:(exceptions_count << 1)]
+        # Índice del primer entero de excepciones. Nota: (n + 31) >> 5 =
+        # techo(n/32)
+        exceptions_start = (bit_offset + 31) >> 5
+
+        # Decode de índices y excepciones (x2 ya que se almacenan ambos).
+        # Nota: n*2 = n << 1
+        exceptions = simple16encoder.decode(encoded, exceptions_count << 1,
+                                            exceptions_start)
         decoded = __merge_exceptions(decoded, exceptions, b)
 
+    if prefix_sum:
+        return gapsenc.prefix_sum(decoded, base)
+
     return decoded
 
 
+def encode_blocks(docids, opt_pfor=False):
+    '''Codifica una lista creciente de docids a PFor en bloques de BLOCK_SIZE
+    números (ver docstring del módulo).
+
+    Args:
+        docids (int list): docids a codificar.
+        opt_pfor (bool): indica si los bloques se codifican en OptPFor (ver
+            encode).
+
+    Returns
+        encoded (int list): lista de números codificada.
+    '''
+    directory = []
+    blocks = []
+
+    previous = 0
+    for start in range(0, len(docids), BLOCK_SIZE):
+        block_docids = docids[start:start+BLOCK_SIZE]
+
+        # D-gaps del bloque (relativos al último docid del bloque anterior).
+        gaps = [block_docids[0] - previous]
+        for i in range(1, len(block_docids)):
+            gaps.append(block_docids[i] - block_docids[i-1])
+        previous = block_docids[-1]
+
+        directory += [previous, len(blocks)]
+        blocks += encode(gaps, opt_pfor)
+
+    return directory + blocks
+
+
+def __get_block_entry(encoded, nums, block, offset=0):
+    '''Retorna los datos del directorio de un bloque.
+
+    Args:
+        encoded (int list): números codificados (ver encode_blocks).
+        nums (int): cantidad total de números de la codificación.
+        block (int): índice de bloque.
+        offset (int): índice de inicio (directorio) de la codificación en
+            encoded.
+
+    Returns:
+        previous (int): último docid del bloque anterior (0, si es el primero).
+        start (int): índice de inicio del bloque en encoded.
+    '''
+    blocks_count = (nums + BLOCK_SIZE - 1) // BLOCK_SIZE
+    blocks_start = offset + blocks_count * BLOCK_ENTRY_SIZE
+
+    entry = offset + block * BLOCK_ENTRY_SIZE
+    start = blocks_start + encoded[entry+1]
+
+    previous = encoded[entry-BLOCK_ENTRY_SIZE] if block > 0 else 0
+    return previous, start
+
+
+def decode_block(encoded, nums, block, offset=0):
+    '''Decodifica un único bloque de una codificación PFor en bloques.
+
+    Args:
+        encoded (int list): números codificados (ver encode_blocks).
+        nums (int): cantidad total de números de la codificación.
+        block (int): índice de bloque a decodificar.
+        offset (int): índice de inicio (directorio) de la codificación en
+            encoded.
+
+    Returns:
+        docids (int list): docids decodificados del bloque.
+    '''
+    previous, start = __get_block_entry(encoded, nums, block, offset)
+
+    # Cantidad de números del bloque (el último puede estar incompleto).
+    block_nums = min(BLOCK_SIZE, nums - block*BLOCK_SIZE)
+
+    # Reconstrucción de docids desde el último docid del bloque anterior.
+    return decode(encoded, block_nums, start, prefix_sum=True, base=previous)
+
+
+def decode_blocks(encoded, nums, offset=0, first=0, last=None):
+    '''Decodifica un rango de bloques de una codificación PFor en bloques.
+
+    Args:
+        encoded (int list): números codificados (ver encode_blocks).
+        nums (int): cantidad total de números de la codificación.
+        offset (int): índice de inicio (directorio) de la codificación en
+            encoded.
+        first (int): índice del primer bloque a decodificar.
+        last (int): índice del último bloque a decodificar (inclusive). Por
+            omisión, el último bloque de la codificación.
+
+    Returns:
+        docids (int list): docids decodificados.
+    '''
+    if last is None:
+        last = (nums + BLOCK_SIZE - 1) // BLOCK_SIZE - 1
+
+    docids = []
+    for block in range(first, last+1):
+        docids.extend(decode_block(encoded, nums, block, offset))
+
+    return docids
+
+
+def next_geq(encoded, nums, docid, offset=0):
+    '''Busca el primer docid mayor o igual al dado en una codificación PFor en
+    bloques, decodificando únicamente el bloque que lo contiene.
+
+    Args:
+        encoded (int list): números codificados (ver encode_blocks).
+        nums (int): cantidad total de números de la codificación.
+        docid (int): docid a buscar.
+        offset (int): índice de inicio (directorio) de la codificación en
+            encoded.
+
+    Returns:
+        index (int): índice del docid hallado (o nums, si no existe).
+        found (int): docid hallado (o None, si no existe).
+    '''
+    # Búsqueda binaria del primer bloque cuyo último docid es >= al buscado.
+    low = 0
+    high = (nums + BLOCK_SIZE - 1) // BLOCK_SIZE
+    while low < high:
+        middle = (low + high) >> 1
+        if encoded[offset + middle * BLOCK_ENTRY_SIZE] < docid:
+            low = middle + 1
+        else:
+            high = middle
+
+    if low * BLOCK_SIZE >= nums:
+        return nums, None
+
+    docids = decode_block(encoded, nums, low, offset)
+    for i in range(0, len(docids)):
+        if docids[i] >= docid:
+            return low * BLOCK_SIZE + i, docids[i]
+
+
 def main():
     '''Prueba de funcionamiento de las funciones encode y decode.'''
     print("Prueba de encode/decode de 1 millón de enteros en curso...")
@@ -304,5 +636,58 @@ def main():
     print("Encoded time: {0}".format(encoded_time))
     print("Decoded time: {0}".format(decoded_time))
 
+    # Decode por bloques: cada bloque debe decodificarse leyendo sólo sus
+    # entradas de directorio y sus enteros (ver skip directory), sin importar
+    # su posición. Se usan gaps con excepciones cada 16 números, que se
+    # decodifican en S16.
+    docids = []
+    docid = 0
+    for i in range(0, 1000000):
+        docid += 1000 if i % 16 == 0 else 1 + (i % 3)
+        docids.append(docid)
+
+    class TracedList(list):
+        '''Lista que registra los índices leídos.'''
+        def __getitem__(self, index):
+            self.read.add(index)
+            return list.__getitem__(self, index)
+
+        def __iter__(self):
+            for index in range(0, len(self)):
+                yield self[index]
+
+    encoded = TracedList(encode_blocks(docids))
+    blocks_count = (len(docids) + BLOCK_SIZE - 1) // BLOCK_SIZE
+    blocks_start = blocks_count * BLOCK_ENTRY_SIZE
+
+    block_times = []
+    for block in (0, blocks_count - 1):
+        entry = block * BLOCK_ENTRY_SIZE
+        start = blocks_start + list.__getitem__(encoded, entry+1)
+        if block + 1 < blocks_count:
+            end = blocks_start + list.__getitem__(encoded,
+                                                  entry+1+BLOCK_ENTRY_SIZE)
+        else:
+            end = len(encoded)
+
+        encoded.read = set()
+        start_time = time.time()
+        decoded = decode_block(encoded, len(docids), block)
+        end_time = time.time()
+        block_times.append(end_time-start_time)
+
+        if docids[block*BLOCK_SIZE:(block+1)*BLOCK_SIZE] != decoded:
+            print("ATENCIÓN: bloque {0} != decoded.".format(block))
+            return
+
+        allowed = {entry-BLOCK_ENTRY_SIZE, entry, entry+1}
+        if any(i not in allowed and not start <= i < end
+               for i in encoded.read):
+            print("ATENCIÓN: bloque {0} lee fuera de su rango.".format(block))
+            return
+
+    print("First block time: {0}".format(block_times[0]))
+    print("Last block time: {0}".format(block_times[1]))
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+- Nombre: postingcache.py
+- Descripción: contiene la clase 'PostingCache' (ver docstring), que permite
+mantener en memoria listas (o bloques de listas) decodificadas, con un
+presupuesto de memoria acotado.
+- Autor: Agustín González
+- Modificado: 16/10/26
+
+Funcionamiento básico: cada entrada se identifica por el par (id de lista, id
+de bloque) y contiene los números decodificados en un array('I') (o
+array('Q'), si algún número excede los 32 bits), cuyo tamaño es el de los
+números en sí (4 u 8 bytes por número) más ENTRY_BYTES. Las entradas se
+mantienen en orden de uso (LRU): al superarse el presupuesto, se eliminan las
+de uso menos reciente. La decodificación en caso de miss se delega en una
+función dada, por lo que la caché admite cualquier códec de 'EncodeTypes'
+(por ejemplo, con listcodec.decode o PostingFileReader.read) y cualquier
+división en bloques (por ejemplo, pforencoder.decode_block o
+bitpackingencoder.decode_block). Las listas completas utilizan LIST_BLOCK
+como id de bloque.
+'''
+
+from array import array
+from collections import OrderedDict
+
+try:
+    # Relative import.
+    from . import EncodeTypes
+    from . import listcodec
+except:
+    # Import para ejecución 'directa' del script.
+    import time
+    import random
+    from __init__ import EncodeTypes
+    import listcodec
+
+# Presupuesto de memoria por omisión (en bytes).
+CACHE_CAPACITY = 1 << 26
+
+# Tamaño estimado (en bytes) de cada entrada sin contar sus números: clave,
+# entrada del diccionario y array vacío.
+ENTRY_BYTES = 160
+
+# Id de bloque de las listas completas.
+LIST_BLOCK = -1
+
+
+class PostingCache(object):
+    '''Caché LRU de listas (o bloques de listas) decodificadas, con
+    presupuesto de memoria acotado (ver docstring del módulo).'''
+
+    def __init__(self, capacity=CACHE_CAPACITY):
+        '''Inicializa clase.
+
+        Args:
+            capacity (int): presupuesto de memoria (en bytes).
+        '''
+        self.__capacity = capacity
+        self.__entries = OrderedDict()
+        self.__size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        '''Retorna la cantidad de entradas de la caché.
+
+        Returns:
+            len (int): cantidad de entradas.
+        '''
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        '''Indica si el par (id de lista, id de bloque) se encuentra en la
+        caché (sin modificar el orden de uso ni los contadores).'''
+        return key in self.__entries
+
+    def size(self):
+        '''Retorna el tamaño estimado (en bytes) de las entradas de la caché.
+
+        Returns:
+            size (int): tamaño en bytes.
+        '''
+        return self.__size
+
+    def capacity(self):
+        '''Retorna el presupuesto de memoria (en bytes) de la caché.
+
+        Returns:
+            capacity (int): presupuesto en bytes.
+        '''
+        return self.__capacity
+
+    def stats(self):
+        '''Retorna los contadores de la caché.
+
+        Returns:
+            stats (dict): hits, misses, evictions, entradas y tamaño (en
+                bytes).
+        '''
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "entries": len(self.__entries),
+                "size": self.__size}
+
+    def __to_array(self, numbers):
+        '''Convierte una lista de números a array('I') o, si algún número
+        excede los 32 bits, a array('Q').
+
+        Args:
+            numbers (int list): números a convertir.
+
+        Returns:
+            numbers (array): números convertidos.
+        '''
+        try:
+            return array("I", numbers)
+        except OverflowError:
+            return array("Q", numbers)
+
+    def get(self, list_id, block, decode, *args):
+        '''Retorna los números decodificados de un bloque de una lista. Si no
+        se encuentran en la caché (miss), se decodifican con la función dada
+        y se almacenan.
+
+        Args:
+            list_id (int): id de lista (por ejemplo, id de término).
+            block (int): id de bloque (LIST_BLOCK, para listas completas).
+            decode (function): función de decodificación del bloque.
+            args: argumentos de la función de decodificación.
+
+        Returns:
+            numbers (array): números decodificados (no deben modificarse).
+        '''
+        key = (list_id, block)
+        numbers = self.__entries.pop(key, None)
+
+        if numbers is not None:
+            # Hit: reinserción como entrada de uso más reciente.
+            self.hits += 1
+            self.__entries[key] = numbers
+            return numbers
+
+        self.misses += 1
+        numbers = self.__to_array(decode(*args))
+        self.put(list_id, block, numbers)
+        return numbers
+
+    def put(self, list_id, block, numbers):
+        '''Almacena los números decodificados de un bloque de una lista,
+        eliminando las entradas de uso menos reciente necesarias para no
+        superar el presupuesto. Los bloques que por sí mismos lo superan no
+        se almacenan.
+
+        Args:
+            list_id (int): id de lista.
+            block (int): id de bloque.
+            numbers (array): números decodificados.
+        '''
+        key = (list_id, block)
+        self.discard(list_id, block)
+
+        size = ENTRY_BYTES + len(numbers)*numbers.itemsize
+        if size > self.__capacity:
+            return
+
+        while self.__size + size > self.__capacity:
+            # Nota: popitem(last=False) elimina la entrada más antigua.
+            _, evicted = self.__entries.popitem(last=False)
+            self.__size -= ENTRY_BYTES + len(evicted)*evicted.itemsize
+            self.evictions += 1
+
+        self.__entries[key] = numbers
+        self.__size += size
+
+    def discard(self, list_id, block):
+        '''Elimina un bloque de una lista de la caché (si existe).
+
+        Args:
+            list_id (int): id de lista.
+            block (int): id de bloque.
+        '''
+        numbers = self.__entries.pop((list_id, block), None)
+        if numbers is not None:
+            self.__size -= ENTRY_BYTES + len(numbers)*numbers.itemsize
+
+    def clear(self):
+        '''Elimina todas las entradas de la caché y reinicia los contadores.'''
+        self.__entries.clear()
+        self.__size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def decode(self, list_id, encoded, nums, codec):
+        '''Retorna una lista completa codificada con cualquier códec de
+        'EncodeTypes' (ver listcodec.decode), desde la caché si es posible.
+
+        Args:
+            list_id (int): id de lista.
+            encoded (bytes): números codificados.
+            nums (int): cantidad de números a decodificar.
+            codec (EncodeTypes): códec utilizado en la codificación.
+
+        Returns:
+            numbers (array): números decodificados.
+        '''
+        return self.get(list_id, LIST_BLOCK, listcodec.decode, encoded, nums,
+                        codec)
+
+    def read(self, reader, term):
+        '''Retorna la lista de un término de un archivo de listas (ver
+        PostingFileReader), desde la caché si es posible. El id de lista es el
+        id de término.
+
+        Args:
+            reader (PostingFileReader): lector del archivo de listas.
+            term (int): id de término.
+
+        Returns:
+            numbers (array): números decodificados.
+        '''
+        return self.get(term, LIST_BLOCK, reader.read, term)
+
+
+def main():
+    '''Prueba de funcionamiento de la clase PostingCache.'''
+    print("Prueba de 10.000 consultas sobre 1.000 listas en curso...")
+    random.seed(0)
+    codec = EncodeTypes.PForDelta
+    lists = [list(range(0, random.randint(100, 1000))) for _ in range(0, 1000)]
+    encoded = [listcodec.encode(numbers, codec) for numbers in lists]
+
+    # Consultas con distribución sesgada: pocas listas concentran la mayoría.
+    queries = [int(random.paretovariate(1.0)) % len(lists)
+               for _ in range(0, 10000)]
+
+    # Sin caché
+    start = time.time()
+    for query in queries:
+        listcodec.decode(encoded[query], len(lists[query]), codec)
+    end = time.time()
+    uncached_time = end-start
+
+    # Con caché (1 MB)
+    cache = PostingCache(1 << 20)
+    start = time.time()
+    for query in queries:
+        numbers = cache.decode(query, encoded[query], len(lists[query]),
+                               codec)
+        if numbers.tolist() != lists[query]:
+            print("ATENCIÓN: numbers != decoded ({0}).".format(query))
+            return
+    end = time.time()
+    cached_time = end-start
+
+    print("Uncached time: {0}".format(uncached_time))
+    print("Cached time: {0}".format(cached_time))
+    print("Stats: {0}".format(cache.stats()))
+
+if __name__ == '__main__':
+    main()
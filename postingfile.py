@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+- Nombre: postingfile.py
+- Descripción: contiene las clases 'PostingFileWriter' y 'PostingFileReader'
+(ver docstrings), que permiten almacenar múltiples listas codificadas en un
+único archivo.
+- Autor: Agustín González
+- Modificado: 16/10/26
+
+Formato del archivo:
+1. Header: magic (4 bytes), cantidad de listas (32 bits) y offset (64 bits)
+   del directorio.
+2. Listas codificadas (ver listcodec.py), una a continuación de otra.
+3. Directorio: una entrada de tamaño fijo por lista, ordenadas por id de
+   término: id de término (32 bits), offset (64 bits) y tamaño (32 bits) en
+   bytes de la lista, cantidad de números (32 bits) y códec (8 bits, valor de
+   EncodeTypes).
+
+El directorio se ubica al final del archivo (y se referencia desde el header)
+para que las listas puedan escribirse a medida que se codifican, sin conocer
+de antemano la cantidad de listas. Dado que las entradas son de tamaño fijo y
+se encuentran ordenadas, el lector busca cada término directamente en el
+archivo mapeado en memoria (búsqueda binaria), sin cargar el directorio.
+'''
+
+import mmap
+import os
+import struct
+
+try:
+    # Relative import.
+    from . import EncodeTypes
+    from . import listcodec
+except:
+    # Import para ejecución 'directa' del script.
+    import time
+    import tempfile
+    from __init__ import EncodeTypes
+    import listcodec
+
+# Identificador del formato de archivo.
+MAGIC = b"IRPF"
+
+# Formato struct del header: magic, cantidad de listas y offset de directorio.
+HEADER_FORMAT = ">4sIQ"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# Formato struct de cada entrada del directorio: id de término, offset,
+# tamaño, cantidad de números y códec.
+ENTRY_FORMAT = ">IQIIB"
+ENTRY_SIZE = struct.calcsize(ENTRY_FORMAT)
+
+
+class PostingFileWriter(object):
+    '''Permite la escritura de un archivo de listas codificadas (ver docstring
+    del módulo). Las listas pueden agregarse en cualquier orden: el directorio
+    se ordena al cerrar el archivo. Si la escritura no finaliza correctamente
+    (por ejemplo, ante una excepción dentro de un bloque with), el archivo se
+    elimina (ver abort), para no dejar un archivo incompleto.'''
+
+    def __init__(self, path):
+        '''Inicializa clase.
+
+        Args:
+            path (str): ruta del archivo a escribir.
+        '''
+        self.__path = path
+        self.__file = open(path, "wb")
+        self.__entries = []
+
+        # Header provisorio (se sobreescribe al cerrar).
+        self.__file.write(struct.pack(HEADER_FORMAT, MAGIC, 0, 0))
+        self.__offset = HEADER_SIZE
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add(self, term, numbers, codec):
+        '''Codifica y agrega una lista al archivo.
+
+        Args:
+            term (int): id de término de la lista.
+            numbers (int list): números a codificar.
+            codec (EncodeTypes): códec a utilizar.
+        '''
+        self.add_encoded(term, listcodec.encode(numbers, codec), len(numbers),
+                         codec)
+
+    def add_encoded(self, term, encoded, nums, codec):
+        '''Agrega una lista ya codificada (ver listcodec.encode) al archivo.
+
+        Args:
+            term (int): id de término de la lista.
+            encoded (bytes): lista codificada.
+            nums (int): cantidad de números de la lista.
+            codec (EncodeTypes): códec utilizado en la codificación.
+        '''
+        self.__file.write(encoded)
+        self.__entries.append((term, self.__offset, len(encoded), nums,
+                               codec.value))
+        self.__offset += len(encoded)
+
+    def close(self):
+        '''Escribe el directorio y el header definitivo, y cierra el archivo.
+        Si la escritura falla (por ejemplo, ante un término duplicado), el
+        archivo se elimina.'''
+        if self.__file.closed:
+            return
+
+        completed = False
+        try:
+            self.__entries.sort()
+            for i in range(1, len(self.__entries)):
+                if self.__entries[i][0] == self.__entries[i-1][0]:
+                    ex = "Término duplicado: {0}.".format(
+                        self.__entries[i][0])
+                    raise Exception(ex)
+
+            directory = bytearray(ENTRY_SIZE * len(self.__entries))
+            for i in range(0, len(self.__entries)):
+                struct.pack_into(ENTRY_FORMAT, directory, i*ENTRY_SIZE,
+                                 *self.__entries[i])
+            self.__file.write(directory)
+
+            self.__file.seek(0)
+            self.__file.write(struct.pack(HEADER_FORMAT, MAGIC,
+                                          len(self.__entries), self.__offset))
+            completed = True
+        finally:
+            self.__file.close()
+            if not completed:
+                self.abort()
+
+    def abort(self):
+        '''Cierra el archivo sin escribir el directorio y lo elimina.'''
+        if not self.__file.closed:
+            self.__file.close()
+
+        if os.path.exists(self.__path):
+            os.remove(self.__path)
+
+
+class PostingFileReader(object):
+    '''Permite la lectura de un archivo de listas codificadas (ver docstring
+    del módulo). El archivo se mapea en memoria (mmap): al inicializarse sólo
+    se lee el header, y cada lista se decodifica desde una vista (memoryview)
+    de sus bytes, sin leer ni copiar el resto del archivo.'''
+
+    def __init__(self, path):
+        '''Inicializa clase.
+
+        Args:
+            path (str): ruta del archivo a leer.
+        '''
+        self.__file = open(path, "rb")
+        self.__mmap = None
+        self.__view = None
+
+        try:
+            # Nota: no es posible mapear un archivo vacío.
+            if os.fstat(self.__file.fileno()).st_size < HEADER_SIZE:
+                raise Exception("Formato de archivo inválido.")
+
+            self.__mmap = mmap.mmap(self.__file.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+            self.__view = memoryview(self.__mmap)
+
+            magic, self.__lists, self.__directory = struct.unpack_from(
+                HEADER_FORMAT, self.__view)
+            if magic != MAGIC:
+                raise Exception("Formato de archivo inválido.")
+        except:
+            # Liberación de lo abierto hasta el error.
+            if self.__view is not None:
+                self.__view.release()
+            if self.__mmap is not None:
+                self.__mmap.close()
+            self.__file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        '''Retorna la cantidad de listas del archivo.
+
+        Returns:
+            len (int): cantidad de listas.
+        '''
+        return self.__lists
+
+    def __contains__(self, term):
+        return self.entry(term) is not None
+
+    def __read_entry(self, index):
+        '''Lee una entrada del directorio.
+
+        Args:
+            index (int): índice de la entrada.
+
+        Returns:
+            entry (tuple): (id de término, offset, tamaño, cantidad, códec).
+        '''
+        return struct.unpack_from(ENTRY_FORMAT, self.__view,
+                                  self.__directory + index*ENTRY_SIZE)
+
+    def terms(self):
+        '''Recorre los ids de término del archivo (en orden creciente).
+
+        Returns:
+            terms (generator): ids de término.
+        '''
+        for index in range(0, self.__lists):
+            yield self.__read_entry(index)[0]
+
+    def entry(self, term):
+        '''Busca la entrada de directorio de un término (búsqueda binaria).
+
+        Args:
+            term (int): id de término.
+
+        Returns:
+            entry (tuple): (offset, tamaño, cantidad, códec) de la lista, o
+                None si el término no existe.
+        '''
+        low = 0
+        high = self.__lists
+        while low < high:
+            middle = (low + high) >> 1
+            entry = self.__read_entry(middle)
+            if entry[0] < term:
+                low = middle + 1
+            elif entry[0] > term:
+                high = middle
+            else:
+                return entry[1], entry[2], entry[3], EncodeTypes(entry[4])
+
+        return None
+
+    def read_encoded(self, term):
+        '''Retorna la lista codificada de un término, como vista de los bytes
+        del archivo (sin copia). La vista debe liberarse (memoryview.release)
+        antes de cerrar el lector (ver close).
+
+        Args:
+            term (int): id de término.
+
+        Returns:
+            encoded (memoryview): lista codificada.
+            nums (int): cantidad de números de la lista.
+            codec (EncodeTypes): códec utilizado en la codificación.
+        '''
+        entry = self.entry(term)
+        if entry is None:
+            raise KeyError(term)
+
+        offset, size, nums, codec = entry
+        return self.__view[offset:offset+size], nums, codec
+
+    def read(self, term):
+        '''Decodifica la lista de un término.
+
+        Args:
+            term (int): id de término.
+
+        Returns:
+            decoded (int list): números decodificados.
+        '''
+        encoded, nums, codec = self.read_encoded(term)
+        try:
+            return listcodec.decode(encoded, nums, codec)
+        finally:
+            encoded.release()
+
+    def close(self):
+        '''Libera la vista y el mapeo del archivo, y cierra el archivo. Las
+        vistas retornadas por read_encoded deben liberarse antes
+        (memoryview.release): de lo contrario, se lanza una excepción y el
+        lector permanece abierto (y puede cerrarse nuevamente luego de
+        liberarlas).'''
+        if self.__file.closed:
+            return
+
+        self.__view.release()
+        try:
+            self.__mmap.close()
+        except BufferError:
+            # Vistas de read_encoded sin liberar: el mapeo no puede cerrarse,
+            # por lo que se restaura la vista del lector.
+            self.__view = memoryview(self.__mmap)
+            raise Exception("Existen vistas de listas (ver read_encoded) "
+                            "sin liberar.")
+
+        self.__file.close()
+
+
+def main():
+    '''Prueba de funcionamiento de las clases de escritura y lectura.'''
+    print("Prueba de escritura/lectura de 10.000 listas en curso...")
+    lists = {term: list(range(term, term + 1000, 3))
+             for term in range(0, 10000)}
+    path = os.path.join(tempfile.mkdtemp(), "postings.irpf")
+
+    # Write
+    start = time.time()
+    with PostingFileWriter(path) as writer:
+        for term, numbers in lists.items():
+            writer.add(term, numbers, EncodeTypes.PartitionedEliasFano)
+    end = time.time()
+    write_time = end-start
+
+    # Open
+    start = time.time()
+    reader = PostingFileReader(path)
+    end = time.time()
+    open_time = end-start
+
+    # Read
+    start = time.time()
+    for term, numbers in lists.items():
+        if reader.read(term) != numbers:
+            print("ATENCIÓN: numbers != decoded ({0}).".format(term))
+            return
+    end = time.time()
+    read_time = end-start
+    reader.close()
+
+    print("Write time: {0}".format(write_time))
+    print("Open time: {0}".format(open_time))
+    print("Read time: {0}".format(read_time))
+
+    # Archivos vacío y truncado (header incompleto).
+    for data in (b"", MAGIC):
+        with open(path, "wb") as invalid_file:
+            invalid_file.write(data)
+        try:
+            PostingFileReader(path).close()
+        except Exception as ex:
+            if str(ex) != "Formato de archivo inválido.":
+                raise
+        else:
+            print("ATENCIÓN: archivo inválido aceptado ({0}).".format(data))
+            return
+
+if __name__ == '__main__':
+    main()
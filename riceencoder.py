@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+- Nombre: riceencoder.py
+- Descripción: permite encode/decode de enteros a/desde Golomb-Rice.
+- Autor: Agustín González
+- Modificado: 16/10/26
+
+Funcionamiento básico: dado un parámetro k, cada número n se divide en un
+cociente q = n >> k (codificado en unario) y un resto r = n & (2^k - 1)
+(codificado en binario de k bits). Los números se codifican en bloques de
+BLOCK_SIZE números y cada bloque utiliza su propio k, estimado a partir de la
+media de sus números (ver __find_k), que se almacena en K_BITS bits al inicio
+del bloque. Al igual que en Elias Fano (ver eliasfanoencoder.py), los restos
+de todo el bloque preceden a los cocientes, por lo que estos últimos se leen
+con una única decodificación unaria (por tablas) por bloque.
+
+encoded = [k][restos][cocientes en unario][k][restos][...]
+'''
+
+import math
+
+try:
+    # Relative import.
+    from . import bitutils
+    from . import unaryencoder as ue
+    from .bitbytearray import BitWriter
+except:
+    # Import para ejecución 'directa' del script.
+    import time
+    import bitutils
+    import unaryencoder as ue
+    from bitbytearray import BitWriter
+
+# Cantidad de números por bloque.
+BLOCK_SIZE = 128
+
+# Bits del header de bloque (parámetro k, de 0 a 63).
+K_BITS = 6
+
+# Máximo valor de k.
+MAX_K = (1 << K_BITS) - 1
+
+
+def __block_size(block, k):
+    '''Calcula el tamaño de codificación de un bloque para el k dado (sin
+    header).
+
+    Args:
+        block (int list): números del bloque.
+        k (int): parámetro de Rice.
+
+    Returns:
+        size (int): tamaño de codificación en bits.
+    '''
+    # Resto (k bits) y terminador unario por número, más los cocientes.
+    return len(block)*(k + 1) + sum(number >> k for number in block)
+
+
+def __find_k(block):
+    '''Halla el parámetro k de un bloque. Para una distribución geométrica de
+    media m, el parámetro de Golomb óptimo es aproximadamente ln(2)*m, por lo
+    que se evalúa k = floor(log2(ln(2)*m)) y el siguiente, y se escoge el de
+    menor tamaño de codificación.
+
+    Args:
+        block (int list): números del bloque.
+
+    Returns:
+        k (int): parámetro de Rice.
+    '''
+    golomb = int(math.log(2) * sum(block) / len(block))
+    k = min(max(golomb.bit_length() - 1, 0), MAX_K - 1)
+
+    if __block_size(block, k + 1) < __block_size(block, k):
+        return k + 1
+    return k
+
+
+def compute_encoded_size(numbers):
+    '''Calcula el tamaño de codificación final de la lista dada.
+
+    Args:
+        numbers (int list): números a codificar.
+
+    Returns:
+        size (int): tamaño de codificación final en bits.
+    '''
+    size = 0
+    for start in range(0, len(numbers), BLOCK_SIZE):
+        block = numbers[start:start+BLOCK_SIZE]
+        size += K_BITS + __block_size(block, __find_k(block))
+    return size
+
+
+def encode(numbers):
+    '''Codifica una lista de números a Golomb-Rice.
+
+    Args:
+        numbers (int list): números a codificar.
+
+    Returns:
+        encoded (bytearray): números codificados.
+        padding (int): relleno (en bits) del último byte de la codificación.
+    '''
+    # Tamaño estimado: 2 bytes por número. Nota: n << 1 = n * 2
+    writer = BitWriter(len(numbers) << 1)
+
+    for start in range(0, len(numbers), BLOCK_SIZE):
+        block = numbers[start:start+BLOCK_SIZE]
+        k = __find_k(block)
+
+        # 1. Header.
+        writer.write_bits(k, K_BITS)
+
+        # 2. Restos.
+        mask = (1 << k) - 1
+        for number in block:
+            writer.write_bits(number & mask, k)
+
+        # 3. Cocientes (unario no optimizado).
+        for number in block:
+            writer.write_unary(number >> k)
+
+    return writer.to_bytearray(), writer.padding()
+
+
+def decode(encoded, nums, offset=0):
+    '''Decodifica una secuencia de bytes codificada en Golomb-Rice.
+
+    Args:
+        encoded (byte list): números codificados.
+        nums (int): cantidad de números a decodificar.
+        offset (int): nro. de bit de inicio de lectura.
+
+    Returns:
+        decoded (int list): números decodificados.
+    '''
+    decoded = []
+    read = bitutils.read_binary_from_barray
+
+    while len(decoded) < nums:
+        size = min(BLOCK_SIZE, nums - len(decoded))
+
+        # 1. Header.
+        k = read(encoded, offset, K_BITS)
+        offset += K_BITS
+
+        # 2. Restos.
+        if k:
+            remainders = [read(encoded, offset + i*k, k)
+                          for i in range(0, size)]
+        else:
+            remainders = [0] * size
+        offset += size*k
+
+        # 3. Cocientes (decodificación unaria por tablas).
+        quotients, offset = ue.decode_with_offset(encoded, size, False,
+                                                  offset)
+
+        decoded.extend([(quotients[i] << k) | remainders[i]
+                        for i in range(0, size)])
+
+    return decoded
+
+
+def main():
+    '''Prueba de funcionamiento de las funciones encode y decode.'''
+    print("Prueba de encode/decode de 1 millón de enteros en curso...")
+    numbers = [1, 7, 30, 12, 3, 100, 18, 9] * 125000
+
+    # Encode
+    start = time.time()
+    encoded, _ = encode(numbers)
+    end = time.time()
+    encoded_time = end-start
+
+    # Decode
+    start = time.time()
+    decoded = decode(encoded, len(numbers))
+    end = time.time()
+    decoded_time = end-start
+
+    if numbers != decoded:
+        print(numbers[-5:], decoded[-5:])
+        print("ATENCIÓN: numbers != decoded.")
+        return
+
+    print("Encoded time: {0}".format(encoded_time))
+    print("Decoded time: {0}".format(decoded_time))
+
+if __name__ == '__main__':
+    main()
@@ -4,11 +4,18 @@
 - Nombre: simple16encoder.py
 - Descripción: permite encode/decode de paquetes de enteros a/desde Simple16.
 - Autor: Agustín González
-- Modificado: 17/04/18
+- Modificado: 16/10/26
 '''
 
 import time
 
+try:
+    # Relative import.
+    from . import gapsencoder as gapsenc
+except:
+    # Import para ejecución 'directa' del script.
+    import gapsencoder as gapsenc
+
 # Posibles combinaciones de bits a comprimir (ord. de slots de mayor a menor).
 # Nota: listado basado en "Performance of Compressed Inverted List Caching
 # in Search Engines" de Zhang, Long y Suel y en implementación kamikaze
@@ -38,6 +45,92 @@ S16_FORMAT_KEYS_REVERSED = list(reversed(sorted(S16_FORMATS.keys())))
 MASKS = {x: (1 << x)-1 for x in range(0, 33)}
 
 
+# Límites de los rangos de slots en los que se agrupan los bits requeridos de
+# los números evaluados: cada slot de cada formato S16 pertenece a un único
+# rango de igual tamaño de slot (ej.: el rango [9, 14) siempre tiene slots de
+# igual tamaño, cualquiera sea el formato), por lo que basta con comparar el
+# máximo de cada rango contra el tamaño del slot.
+SELECTOR_RANGES = [(i, i+1) for i in range(0, 9)] + [(9, 14), (14, 21),
+                                                     (21, 28)]
+
+
+def __build_format_selector():
+    '''Genera la función de selección de formato S16 a partir de los máximos
+    de bits requeridos por rango (ver SELECTOR_RANGES): una única secuencia de
+    comparaciones (sin ciclos) que evalúa los formatos en orden descendente.
+
+    Returns:
+        selector (function): función de la forma selector(*maxima), que
+            retorna el formato S16 a utilizar (o None si ninguno se ajusta).
+    '''
+    args = ["m{0}".format(i) for i in range(0, len(SELECTOR_RANGES))]
+
+    source = "def select_format({0}):\n".format(", ".join(args))
+    for s16f in S16_FORMAT_KEYS_REVERSED:
+        slots = S16_FORMATS[s16f]
+        conditions = []
+        for i in range(0, len(SELECTOR_RANGES)):
+            begin = SELECTOR_RANGES[i][0]
+
+            # Los rangos posteriores a los slots del formato no se evalúan
+            # (sus números se codificarán en el siguiente lote).
+            if begin >= len(slots):
+                break
+            conditions.append("{0} <= {1}".format(args[i], slots[begin]))
+
+        source += "    if {0}:\n".format(" and ".join(conditions))
+        source += "        return {0}\n".format(s16f)
+
+    namespace = {}
+    exec(source, namespace)
+    return namespace["select_format"]
+
+
+# Función de selección de formato (ver __build_format_selector).
+SELECT_FORMAT = __build_format_selector()
+
+# Desplazamientos (shifts) de cada slot de cada formato S16 en el lote.
+S16_SHIFTS = {s16f: [28 - sum(slots[:i+1]) for i in range(0, len(slots))]
+              for s16f, slots in S16_FORMATS.items()}
+
+
+def __build_decode_kernel(s16format):
+    '''Genera una función de decodificación 'desenrollada' para el formato S16
+    dado: cada slot se extrae con un shift y una máscara constantes (sin
+    ciclos ni búsquedas en S16_FORMATS o MASKS), y los números se agregan de
+    una única vez a la lista de salida recibida por parámetro.
+
+    Args:
+        s16format (int): formato s16 de la función a generar.
+
+    Returns:
+        kernel (function): función de la forma kernel(batch, numbers).
+    '''
+    slots = []
+    offset = 0
+    for bits_to_process in S16_FORMATS[s16format]:
+        offset += bits_to_process
+        shift = 28 - offset
+        if shift:
+            slots.append("(batch >> {0}) & {1}".format(shift,
+                                                      MASKS[bits_to_process]))
+        else:
+            slots.append("batch & {0}".format(MASKS[bits_to_process]))
+
+    name = "decode_format_{0}".format(s16format)
+    source = "def {0}(batch, numbers):\n".format(name)
+    source += "    numbers.extend(({0},))\n".format(", ".join(slots))
+
+    namespace = {}
+    exec(source, namespace)
+    return namespace[name]
+
+
+# Funciones de decodificación por formato (índice = formato s16).
+DECODE_KERNELS = [__build_decode_kernel(s16f)
+                  for s16f in sorted(S16_FORMATS.keys())]
+
+
 def find_optimal_format(numbers, start):
     '''Busca el formato S16 óptimo para una lista de números.
 
@@ -75,6 +168,59 @@ def find_optimal_format(numbers, start):
         # Sino: se continúa prueba con el siguiente formato s16.
 
 
+def find_optimal_format_by_widths(widths, start):
+    '''Busca el formato S16 óptimo para una lista de números, a partir de la
+    cantidad de bits requeridos (bit_length) por cada número. El resultado es
+    idéntico al de find_optimal_format aunque, en vez de comparar cada número
+    contra la máscara de su slot para cada formato, se calcula una única vez
+    el máximo de bits requeridos por rango de slots (ver SELECTOR_RANGES) y
+    se evalúan todos los formatos con SELECT_FORMAT.
+
+    Args:
+        widths (int list): bits requeridos por cada número de la lista.
+        start (int): índice desde el que se evaluará la lista.
+
+    Returns:
+        format (int): índice de formato (de S16_FORMATS) a utilizar.
+        slots_size (int): cantidad de números a codificar con el formato S16.
+    '''
+    # Ventana de números evaluados (28: máxima cantidad de slots). Los slots
+    # sin números se completan con 0s, lo que evita el 'sobre-ajuste' (ver
+    # find_optimal_format).
+    window = widths[start:start+28]
+    if len(window) < 28:
+        window += [0] * (28 - len(window))
+
+    s16f = SELECT_FORMAT(window[0], window[1], window[2], window[3],
+                         window[4], window[5], window[6], window[7],
+                         window[8], max(window[9:14]), max(window[14:21]),
+                         max(window[21:28]))
+
+    if s16f is not None:
+        return s16f, len(S16_FORMATS[s16f])
+
+
+def compute_encoded_size(numbers):
+    '''Calcula el tamaño de codificación final de la lista dada.
+
+    Args:
+        numbers (int list): números a codificar.
+
+    Returns:
+        size (int): tamaño de codificación final en bits.
+    '''
+    widths = [number.bit_length() for number in numbers]
+
+    words = 0
+    start = 0
+    while start < len(numbers):
+        start += find_optimal_format_by_widths(widths, start)[1]
+        words += 1
+
+    # Nota: n << 5 = n * 32
+    return words << 5
+
+
 def encode(numbers):
     '''Codifica una lista de números a S16.
 
@@ -84,25 +230,25 @@ def encode(numbers):
     Returns:
         encoded (int list): números codificados.
     '''
+    # Bits requeridos por cada número (calculados una única vez).
+    widths = [number.bit_length() for number in numbers]
+
     encoded = []
     start = 0  # Índice desde el que se evaluará numbers.
     while start < len(numbers):
-        s16format, numbers_to_encode = find_optimal_format(numbers, start)
+        s16format, numbers_to_encode = find_optimal_format_by_widths(widths,
+                                                                     start)
         to_encode = numbers[start: start+numbers_to_encode]
 
         # Incremento de índice de start para próxima evaluación.
         start += numbers_to_encode
 
-        # Bits a mover para tener en cuenta header.
-        bits_to_move = 28
-
-        # Lote codificado.
-        encoded_batch = (s16format) << bits_to_move
+        # Lote codificado (header en los 4 bits más significativos).
+        encoded_batch = s16format << 28
 
+        shifts = S16_SHIFTS[s16format]
         for i in range(0, len(to_encode)):
-            bits_to_move -= S16_FORMATS[s16format][i]
-            shifted = to_encode[i] << bits_to_move
-            encoded_batch += shifted
+            encoded_batch += to_encode[i] << shifts[i]
 
         encoded.append(encoded_batch)
 
@@ -120,42 +266,59 @@ def decode_batch(batch, s16format):
         numbers (int list): números decodificados.
     '''
     numbers = []
-    offset = 0
-
-    for bits_to_process in S16_FORMATS[s16format]:
-        # Incremento de offset según siguiente bit a procesar
-        offset += bits_to_process
-
-        # Obtención de número y append.
-        # number = (batch >> 28-offset) & MASKS[bits_to_process]
-        numbers.append((batch >> 28-offset) & MASKS[bits_to_process])
+    DECODE_KERNELS[s16format](batch, numbers)
     return numbers
 
 
-def decode(encoded, remove_trailing_zeros=True):
-    '''Decodifica una secuencia de enteros codificada en S16.
+def decode(encoded, nums=None, offset=0, prefix_sum=False, base=0):
+    '''Decodifica una secuencia de enteros codificada en S16. Cada lote de 32
+    bits se decodifica con la función generada para su formato (ver
+    DECODE_KERNELS), que escribe directamente en la lista de salida. Los
+    lotes se leen desde el índice offset, sin copiar encoded.
 
     Args:
-        encoded (int list): números codificados.
-        remove_trailing_zeros (bool): por defecto en True, especifica si se
-            deben eliminar los ceros finales de la lista decodificada.
+        encoded (int list): números codificados (lista o cualquier secuencia
+            de enteros de 32 bits, como array('I') o memoryview).
+        nums (int): cantidad de números a decodificar. Por omisión (None), se
+            decodifican todos los lotes y se eliminan los ceros finales de la
+            lista decodificada.
+        offset (int): índice del primer lote en encoded.
+        prefix_sum (bool): indica si los números decodificados son gaps, en
+            cuyo caso se retorna su suma acumulada desde base (ver
+            gapsencoder.prefix_sum). Por omisión, en False.
+        base (int): número desde el que se acumulan los gaps.
 
     Returns:
         numbers (int list): números decodificados.
     '''
     numbers = []
+    kernels = DECODE_KERNELS
 
-    header_mask = MASKS[5]
-    for batch in encoded:
-        # s16format = (batch >> 28) & header_mask
-        numbers.extend(decode_batch(batch, (batch >> 28) & header_mask))
+    if nums is None:
+        for i in range(offset, len(encoded)):
+            batch = encoded[i]
+            # s16format = (batch >> 28) & MASKS[4]
+            kernels[batch >> 28](batch, numbers)
 
-    # Eliminación de trailing zeros.
-    if remove_trailing_zeros:
-        while numbers and numbers[-1] is 0:
+        # Eliminación de trailing zeros.
+        while numbers and numbers[-1] == 0:
             # numbers.pop()
             del numbers[-1]
 
+    else:
+        # Acceso directo por índice: el costo no depende de offset.
+        i, end = offset, len(encoded)
+        while i < end and len(numbers) < nums:
+            batch = encoded[i]
+            kernels[batch >> 28](batch, numbers)
+            i += 1
+
+        # Eliminación de slots posteriores a nums (relleno del último lote).
+        del numbers[nums:]
+
+    if prefix_sum:
+        return gapsenc.prefix_sum(numbers, base)
+
     return numbers
 
 
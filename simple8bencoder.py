@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+- Nombre: simple8bencoder.py
+- Descripción: permite encode/decode de paquetes de enteros a/desde Simple-8b.
+- Autor: Agustín González
+- Modificado: 16/10/26
+
+Nota: algoritmo basado en "Index compression using 64-bit words" de Anh y
+Moffat y en la implementación del repositorio GitHub de @lemire:
+https://github.com/lemire/FastPFor.
+
+Funcionamiento básico: al igual que Simple16 (ver simple16encoder.py), cada
+lote contiene un selector (4 bits más significativos) que indica la cantidad
+de números y de bits por número de los 60 bits restantes. A diferencia de
+Simple16, los lotes son de 64 bits y los selectores 0 y 1 son de 'run': indican
+que el valor almacenado en los 60 bits restantes se repite 240 o 120 veces
+respectivamente (por ejemplo, una secuencia de gaps de 1 se comprime en un
+único lote cada 240 números).
+'''
+
+import time
+
+# Cantidad de números y bits por número de cada selector.
+S8B_FORMATS = {0: (240, 60),  # Run de 240 números.
+               1: (120, 60),  # Run de 120 números.
+               2: (60, 1),
+               3: (30, 2),
+               4: (20, 3),
+               5: (15, 4),
+               6: (12, 5),
+               7: (10, 6),
+               8: (8, 7),
+               9: (7, 8),
+               10: (6, 10),
+               11: (5, 12),
+               12: (4, 15),
+               13: (3, 20),
+               14: (2, 30),
+               15: (1, 60)}
+
+# Selectores de run.
+RUN_SELECTORS = [0, 1]
+
+# Selectores de empaquetado ordenados de mayor a menor cantidad de slots.
+PACK_SELECTORS = list(range(2, 16))
+
+# Tamaño del payload (en bits) de cada lote.
+PAYLOAD_SIZE = 60
+
+# Diccionario de posibles máscaras de bits de 0 a 60.
+MASKS = {x: (1 << x)-1 for x in range(0, PAYLOAD_SIZE+1)}
+
+# Índice (en PACK_SELECTORS) del primer selector de empaquetado cuyos slots
+# permiten números de la cantidad de bits dada (de 0 a 60).
+FIRST_PACK_SELECTOR = [min(i for i in range(0, len(PACK_SELECTORS))
+                           if S8B_FORMATS[PACK_SELECTORS[i]][1] >= bits)
+                       for bits in range(0, PAYLOAD_SIZE+1)]
+
+
+def __build_decode_kernel(selector):
+    '''Genera una función de decodificación 'desenrollada' para el selector
+    dado (ver simple16encoder.DECODE_KERNELS).
+
+    Args:
+        selector (int): selector de la función a generar.
+
+    Returns:
+        kernel (function): función de la forma kernel(batch, numbers).
+    '''
+    nums, bits = S8B_FORMATS[selector]
+    name = "decode_selector_{0}".format(selector)
+    source = "def {0}(batch, numbers):\n".format(name)
+
+    if selector in RUN_SELECTORS:
+        source += "    numbers += [batch & {0}] * {1}\n".format(
+            MASKS[PAYLOAD_SIZE], nums)
+    else:
+        slots = []
+        for i in range(0, nums):
+            shift = PAYLOAD_SIZE - (i+1)*bits
+            if shift:
+                slots.append("(batch >> {0}) & {1}".format(shift, MASKS[bits]))
+            else:
+                slots.append("batch & {0}".format(MASKS[bits]))
+        source += "    numbers.extend(({0},))\n".format(", ".join(slots))
+
+    namespace = {}
+    exec(source, namespace)
+    return namespace[name]
+
+
+# Funciones de decodificación por selector (índice = selector).
+DECODE_KERNELS = [__build_decode_kernel(selector) for selector in range(0, 16)]
+
+
+def find_optimal_selector(numbers, widths, start):
+    '''Busca el selector óptimo para una lista de números desde el índice dado.
+
+    Args:
+        numbers (int list): números a codificar.
+        widths (int list): bits requeridos (bit_length) por cada número.
+        start (int): índice desde el que se evaluará la lista.
+
+    Returns:
+        selector (int): selector a utilizar.
+        slots_size (int): cantidad de números a codificar con el selector.
+    '''
+    first_width = widths[start]
+    if first_width > PAYLOAD_SIZE:
+        ex = "Simple-8b no permite codificar números de más de 60 bits."
+        raise Exception(ex)
+
+    # 1. Runs: sólo si hay números suficientes para completar el run. Nota:
+    # la comparación del último número del run evita la copia de la lista en
+    # la mayoría de los casos sin run.
+    for selector in RUN_SELECTORS:
+        nums = S8B_FORMATS[selector][0]
+        end = start + nums
+        if end <= len(numbers) and numbers[end-1] == numbers[start]:
+            run = numbers[start:end]
+            if run.count(run[0]) == nums:
+                return selector, nums
+
+    # 2. Empaquetado: selector de mayor cantidad de slots en el que se
+    # ajustan los números (los slots sin números se completan con 0s). Los
+    # selectores cuyos slots no admiten al primer número no se evalúan.
+    for selector in PACK_SELECTORS[FIRST_PACK_SELECTOR[first_width]:]:
+        nums, bits = S8B_FORMATS[selector]
+        if max(widths[start:start+nums]) <= bits:
+            return selector, nums
+
+    ex = "Simple-8b no permite codificar números de más de 60 bits."
+    raise Exception(ex)
+
+
+def compute_encoded_size(numbers):
+    '''Calcula el tamaño de codificación final de la lista dada.
+
+    Args:
+        numbers (int list): números a codificar.
+
+    Returns:
+        size (int): tamaño de codificación final en bits.
+    '''
+    widths = [number.bit_length() for number in numbers]
+
+    words = 0
+    start = 0
+    while start < len(numbers):
+        start += find_optimal_selector(numbers, widths, start)[1]
+        words += 1
+
+    # Nota: n << 6 = n * 64
+    return words << 6
+
+
+def encode(numbers):
+    '''Codifica una lista de números a Simple-8b.
+
+    Args:
+        numbers (int list): números a codificar.
+
+    Returns:
+        encoded (int list): números codificados (enteros de 64 bits).
+    '''
+    # Bits requeridos por cada número (calculados una única vez).
+    widths = [number.bit_length() for number in numbers]
+
+    encoded = []
+    start = 0
+    while start < len(numbers):
+        selector, slots_size = find_optimal_selector(numbers, widths, start)
+
+        # Lote codificado (selector en los 4 bits más significativos).
+        encoded_batch = selector << PAYLOAD_SIZE
+
+        if selector in RUN_SELECTORS:
+            encoded_batch += numbers[start]
+        else:
+            bits = S8B_FORMATS[selector][1]
+            shift = PAYLOAD_SIZE
+            for number in numbers[start:start+slots_size]:
+                shift -= bits
+                encoded_batch += number << shift
+
+        encoded.append(encoded_batch)
+        start += slots_size
+
+    return encoded
+
+
+def decode(encoded, nums, offset=0):
+    '''Decodifica una secuencia de enteros codificada en Simple-8b. Los lotes
+    se leen desde el índice offset, sin copiar encoded.
+
+    Args:
+        encoded (int list): números codificados (lista o cualquier secuencia
+            de enteros de 64 bits, como array('Q') o memoryview).
+        nums (int): cantidad de números a decodificar.
+        offset (int): índice del primer lote en encoded.
+
+    Returns:
+        numbers (int list): números decodificados.
+    '''
+    numbers = []
+    kernels = DECODE_KERNELS
+
+    # Acceso directo por índice: el costo no depende de offset.
+    i, end = offset, len(encoded)
+    while i < end and len(numbers) < nums:
+        batch = encoded[i]
+        kernels[batch >> PAYLOAD_SIZE](batch, numbers)
+        i += 1
+
+    # Eliminación de slots posteriores a nums (relleno del último lote).
+    del numbers[nums:]
+    return numbers
+
+
+def main():
+    '''Prueba de funcionamiento de las funciones encode y decode.'''
+    print("Prueba de encode/decode de 1 millón de enteros en curso...")
+    numbers = [1] * 500000 + list(range(0, 500000))
+
+    # Encode
+    start = time.time()
+    encoded = encode(numbers)
+    end = time.time()
+    encoded_time = end-start
+
+    # Decode
+    start = time.time()
+    decoded = decode(encoded, len(numbers))
+    end = time.time()
+    decoded_time = end-start
+
+    if numbers != decoded:
+        print(numbers[-5:], decoded[-5:])
+        print("ATENCIÓN: numbers != decoded.")
+        return
+
+    print("Encoded time: {0}".format(encoded_time))
+    print("Decoded time: {0}".format(decoded_time))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+- Nombre: streamvbyteencoder.py
+- Descripción: permite encode/decode de enteros a/desde Stream VByte.
+- Autor: Agustín González
+- Modificado: 16/10/26
+
+Nota: algoritmo basado en "Stream VByte: Faster Byte-Oriented Integer
+Compression" de Lemire, Kurz y Rupp.
+
+Funcionamiento básico: al igual que Group Varint (ver groupvarintencoder.py),
+la cantidad de bytes (menos 1) de cada número se indica con un código de 2
+bits, 4 códigos por byte de control. A diferencia de Group Varint, los bytes
+de control se almacenan en un flujo separado de los bytes de datos (little
+endian), por lo que las longitudes de todos los números se conocen antes de
+leer los datos: la decodificación se realiza sobre el array completo con
+NumPy (si está instalado), o bien, con las funciones de decodificación por
+descriptor de Group Varint. Los números deben ser de 32 bits como máximo.
+
+encoded = [control: techo(nums/4) bytes][datos]
+'''
+
+import struct
+
+try:
+    # NumPy es opcional: permite la decodificación vectorizada (ver decode).
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    # Relative import.
+    from . import groupvarintencoder as gvenc
+    from .bitutils import np_byte_view
+except:
+    # Import para ejecución 'directa' del script.
+    import time
+    import groupvarintencoder as gvenc
+    from bitutils import np_byte_view
+
+# Cantidad de códigos de longitud por byte de control.
+CODES_PER_BYTE = 4
+
+# Cantidad de bytes de cada número por byte de control.
+CONTROL_LENGTHS = [[((control >> (i << 1)) & 3) + 1
+                    for i in range(0, CODES_PER_BYTE)]
+                   for control in range(0, 256)]
+
+# Tabla anterior como array (decodificación vectorizada).
+NP_CONTROL_LENGTHS = np.array(CONTROL_LENGTHS, dtype=np.uint8) \
+    if np is not None else None
+
+# Máscara de los bytes de un número según su cantidad de bytes (índice).
+NP_LENGTH_MASKS = np.array([0, 0xFF, 0xFFFF, 0xFFFFFF, 0xFFFFFFFF],
+                           dtype=np.uint32) if np is not None else None
+
+
+def __number_length(number):
+    '''Retorna la cantidad de bytes requeridos por un número (de 1 a 4).
+
+    Args:
+        number (int): número a evaluar.
+
+    Returns:
+        length (int): cantidad de bytes.
+    '''
+    if number > gvenc.MAX_NUMBER or number < 0:
+        ex = "Stream VByte no permite codificar números de más de 32 bits."
+        raise Exception(ex)
+
+    # Nota: (n + 7) >> 3 = techo(n/8)
+    return (number.bit_length() + 7) >> 3 or 1
+
+
+def compute_encoded_size(numbers):
+    '''Calcula el tamaño de codificación final de la lista dada.
+
+    Args:
+        numbers (int list): números a codificar.
+
+    Returns:
+        size (int): tamaño de codificación final en bits.
+    '''
+    control_size = -(-len(numbers) // CODES_PER_BYTE)
+    size = control_size + sum(__number_length(n) for n in numbers)
+
+    # Nota: n << 3 = n * 8
+    return size << 3
+
+
+def encode(numbers):
+    '''Codifica una lista de números a Stream VByte.
+
+    Args:
+        numbers (int list): números a codificar.
+
+    Returns:
+        encoded (bytearray): números codificados.
+    '''
+    lengths = [__number_length(number) for number in numbers]
+
+    control = bytearray(-(-len(numbers) // CODES_PER_BYTE))
+    for i in range(0, len(lengths)):
+        # Nota: i >> 2 = i/4; (i & 3) << 1 = (i % 4) * 2
+        control[i >> 2] |= (lengths[i] - 1) << ((i & 3) << 1)
+
+    # Datos: cada número se escribe como entero de 4 bytes (los 3 bytes extra
+    # del array evitan el desborde) y el offset avanza según su longitud, por
+    # lo que los bytes sobrantes se sobreescriben con el siguiente número.
+    data = bytearray(sum(lengths) + 3)
+    pack_into = struct.Struct("<I").pack_into
+    offset = 0
+    for i in range(0, len(numbers)):
+        pack_into(data, offset, numbers[i])
+        offset += lengths[i]
+    del data[offset:]
+
+    return control + data
+
+
+def __np_decode(encoded, nums, start):
+    '''Decodifica una secuencia de bytes codificada en Stream VByte utilizando
+    NumPy: las longitudes se obtienen de los bytes de control mediante
+    NP_CONTROL_LENGTHS, y cada número se lee como un entero de 32 bits desde
+    su primer byte (una única lectura por número, sobre una vista de los
+    datos con paso de 1 byte), eliminando los bytes excedentes con
+    NP_LENGTH_MASKS.
+
+    Args:
+        encoded (byte list): números codificados.
+        nums (int): cantidad de números a decodificar.
+        start (int): índice del primer byte de control.
+
+    Returns:
+        numbers (int list): números decodificados.
+    '''
+    control_size = -(-nums // CODES_PER_BYTE)
+    control = np_byte_view(encoded, start, control_size)
+
+    lengths = NP_CONTROL_LENGTHS[control].ravel()[:nums]
+    ends = np.cumsum(lengths, dtype=np.intp)
+
+    # Datos (más 3 bytes de relleno, para que la lectura de 32 bits desde
+    # cualquier byte de datos no exceda el tamaño del buffer).
+    data_size = int(ends[-1])
+    data = np.zeros(data_size + 3, dtype=np.uint8)
+    data[:-3] = np_byte_view(encoded, start + control_size, data_size)
+
+    # Vista de enteros de 32 bits little-endian con paso de 1 byte: el i-ésimo
+    # elemento de la vista son los 4 bytes que comienzan en data[i].
+    words = np.ndarray(shape=(data_size,), dtype="<u4", buffer=data,
+                       strides=(1,))
+    numbers = words[ends - lengths] & NP_LENGTH_MASKS[lengths]
+
+    # Nota: la conversión desde int64 es más rápida que desde uint32.
+    return numbers.astype(np.int64).tolist()
+
+
+def decode(encoded, nums, offset=0):
+    '''Decodifica una secuencia de bytes codificada en Stream VByte. Si NumPy
+    está instalado, se utiliza una decodificación vectorizada (ver
+    __np_decode), con idéntico resultado. En ambos casos, los bytes se leen
+    directamente desde encoded (sin copia), por lo que puede tratarse de
+    cualquier objeto con protocolo buffer (bytes, bytearray, memoryview,
+    mmap).
+
+    Args:
+        encoded (bytes): números codificados.
+        nums (int): cantidad de números a decodificar.
+        offset (int): nro. de bit de inicio de lectura (múltiplo de 8).
+
+    Returns:
+        numbers (int list): números decodificados.
+    '''
+    if nums <= 0:
+        return []
+
+    # Nota: n >> 3 = int(n / 8)
+    start = offset >> 3
+
+    if np is not None:
+        return __np_decode(encoded, nums, start)
+
+    numbers = []
+    kernels = gvenc.DECODE_KERNELS
+    group_bytes = gvenc.GROUP_BYTES
+
+    # Grupos completos de 4 números: funciones de Group Varint.
+    control_size = -(-nums // CODES_PER_BYTE)
+    offset = start + control_size
+    for i in range(start, start + (nums >> 2)):
+        control = encoded[i]
+        kernels[control](encoded, offset, numbers)
+        offset += group_bytes[control]
+
+    # Último grupo incompleto: lectura número a número.
+    if len(numbers) < nums:
+        for length in CONTROL_LENGTHS[encoded[start+control_size-1]]:
+            if len(numbers) == nums:
+                break
+
+            number = 0
+            for j in range(length - 1, -1, -1):
+                number = (number << 8) | encoded[offset + j]
+            numbers.append(number)
+            offset += length
+
+    return numbers
+
+
+def main():
+    '''Prueba de funcionamiento de las funciones encode y decode.'''
+    print("Prueba de encode/decode de 1 millón de enteros en curso...")
+    numbers = list(range(0, 1000000))
+
+    # Encode
+    start = time.time()
+    encoded = encode(numbers)
+    end = time.time()
+    encoded_time = end-start
+
+    # Decode
+    start = time.time()
+    decoded = decode(encoded, len(numbers))
+    end = time.time()
+    decoded_time = end-start
+
+    if numbers != decoded:
+        print(numbers[-5:], decoded[-5:])
+        print("ATENCIÓN: numbers != decoded.")
+        return
+
+    print("Encoded time: {0}".format(encoded_time))
+    print("Decoded time: {0}".format(decoded_time))
+
+if __name__ == '__main__':
+    main()
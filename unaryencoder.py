@@ -4,12 +4,21 @@
 - Nombre: unaryencoder.py
 - Descripción: permite encode/decode de enteros a/desde unario.
 - Autor: Agustín González
-- Modificado: 17/04/18
+- Modificado: 16/10/26
 '''
 
-import time
 import math
 
+try:
+    # Relative import.
+    from . import gapsencoder as gapsenc
+    from .bitbytearray import BitWriter
+except:
+    # Import para ejecución 'directa' del script.
+    import time
+    import gapsencoder as gapsenc
+    from bitbytearray import BitWriter
+
 # Máscaras de lectura de bit más significativo (de un byte).
 READ_MSB_MASKS = {0: 128, 1: 64, 2: 32, 3: 16, 4: 8, 5: 4, 6: 2, 7: 1, 8: 0}
 
@@ -17,6 +26,46 @@ READ_MSB_MASKS = {0: 128, 1: 64, 2: 32, 3: 16, 4: 8, 5: 4, 6: 2, 7: 1, 8: 0}
 READ_SINCE_MASKS = {0: 255, 1: 127, 2: 63, 3: 31, 4: 15, 5: 7, 6: 3, 7: 1, 8: 0}
 
 
+def __build_decode_table(bit_index, is_optimized):
+    '''Construye la tabla de decodificación de un byte leído desde el bit index
+    dado. Cada entrada de la tabla (una por posible valor de byte) contiene:
+    el primer número completo del byte (o None si no hay terminadores), los
+    restantes números completos, los offsets (relativos al byte) posteriores a
+    cada terminador y la cantidad de 1s finales (sin terminador en el byte).
+
+    Args:
+        bit_index (int): bit de inicio de lectura en el byte.
+        is_optimized (bool): indica si se debe agregar un bit a cada número.
+
+    Returns:
+        table (tuple list): tabla de 256 entradas.
+    '''
+    table = []
+    for byte in range(0, 256):
+        numbers = []
+        ends = []
+        ones = 0
+        for i in range(bit_index, 8):
+            if byte & READ_MSB_MASKS[i]:
+                ones += 1
+                continue
+
+            # Terminador: fin de número.
+            numbers.append(ones + int(is_optimized))
+            ends.append(i+1)
+            ones = 0
+
+        first = numbers[0] if numbers else None
+        table.append((first, tuple(numbers[1:]), tuple(ends), ones))
+    return table
+
+
+# Tablas de decodificación por byte (ver __build_decode_table), indexadas según
+# [is_optimized][bit_index][byte].
+DECODE_TABLES = [[__build_decode_table(i, opt) for i in range(0, 8)]
+                 for opt in (False, True)]
+
+
 def compute_encoded_size(numbers, optimized=True):
     '''Calcula el tamaño de codificación final de la lista dada.
 
@@ -88,8 +137,41 @@ def encode(number, optimize=True):
     return encoded, padding
 
 
-def decode(encoded, nums, is_optimized, offset=0):
-    '''Decodifica una secuencia de bytes codificada en unario.
+def encode_list(numbers, optimize=True):
+    '''Codifica una lista de números a Unario sobre un único array de bits.
+
+    Args:
+        numbers (int list): números a codificar.
+        optimize (bool): indica si se debe eliminar el bit más significativo
+            de cada número codificado. Por omisión, en True.
+
+    Returns:
+        encoded (bytearray): números codificados.
+        padding (int): relleno (en bits) del último byte de la codificación.
+    '''
+    if optimize and 0 in numbers:
+        ex = "No es posible representar el 0 (cero) en unario optimizado."
+        raise Exception(ex)
+
+    # Tamaño de la codificación (en bits): n 1s + terminador por número.
+    size = compute_encoded_size(numbers, optimize)
+
+    # Nota: (n + 7) >> 3 = techo(n/8)
+    writer = BitWriter((size + 7) >> 3)
+
+    # Unario optimizado: n-1 1s seguidos del terminador.
+    shift = 1 if optimize else 0
+    for number in numbers:
+        writer.write_unary(number - shift)
+
+    return writer.to_bytearray(), writer.padding()
+
+
+def decode_with_offset(encoded, nums, is_optimized, offset=0):
+    '''Decodifica una secuencia de bytes codificada en unario, retornando también
+    el offset posterior al último número leído. La lectura se realiza byte a
+    byte mediante las tablas precomputadas de DECODE_TABLES: cada byte
+    decodifica todos sus números completos con una única búsqueda.
 
     Args:
         encoded (byte list): números codificados.
@@ -101,56 +183,95 @@ def decode(encoded, nums, is_optimized, offset=0):
 
     Returns:
         decoded (int list): números decodificados.
+        offset (int): nro. de bit posterior al terminador del último número.
     '''
     decoded = []
 
-    # Inicialización de número.
-    number = int(is_optimized)
+    if nums <= 0:
+        return decoded, offset
+
+    tables = DECODE_TABLES[bool(is_optimized)]
 
     # Byte index en el array. Nota: n >> 3 = n/8
     byte_index = offset >> 3
 
-    # Bit index en el byte index. Nota: n & 7 = n % 8
-    bit_index = offset & 7
+    # Tabla según bit index del primer byte (los restantes se leen desde 0).
+    # Nota: n & 7 = n % 8
+    table = tables[offset & 7]
 
-    for _ in range(nums):
-        # Obtención de máscara de lectura según bit index.
-        read_mask = READ_SINCE_MASKS[bit_index]
+    # 1s acumulados de bytes anteriores (número aún sin terminador).
+    ones = 0
 
-        # Lectura de bits desde el offset dado.
-        readed = encoded[byte_index] & read_mask
+    # Números restantes por decodificar.
+    remaining = nums
 
-        # Si todos los bits leídos son 1s...
-        if readed == read_mask:
-            # Add a number de bits leídos desde el bit index.
-            number += 8 - bit_index
+    while True:
+        first, numbers, ends, trailing_ones = table[encoded[byte_index]]
+        table = tables[0]
+
+        # Si el byte no contiene terminadores, todos sus bits son 1s.
+        if first is None:
+            ones += trailing_ones
             byte_index += 1
+            continue
+
+        count = len(numbers) + 1
 
-            # Optimización para números con más de 8 (ocho) 1s consecutivos.
-            while encoded[byte_index] == 255:
-                number += 8
-                byte_index += 1
+        # Si el byte contiene el último número a decodificar...
+        if count >= remaining:
+            decoded.append(ones + first)
+            decoded.extend(numbers[:remaining-1])
 
-            # Último byte a evaluar: contiene 1s y 0s.
-            readed = encoded[byte_index]
+            # Offset posterior al terminador del último número leído.
+            offset = (byte_index << 3) + ends[remaining-1]
+            return decoded, offset
 
-            # Próxima lectura de readed desde el bit inicial.
-            bit_index = 0
+        # Add de números y 1s restantes para el siguiente byte.
+        decoded.append(ones + first)
+        decoded.extend(numbers)
+        ones = trailing_ones
+        remaining -= count
+        byte_index += 1
 
-        # Verificación de leading 1s de readed: ciclo mientras el valor sea 1.
-        while readed & READ_MSB_MASKS[bit_index]:
-            number += 1
-            bit_index += 1
 
-        # Add de number
-        decoded.append(number)
+def decode_number(encoded, is_optimized, offset=0):
+    '''Decodifica un número codificado en unario desde el offset dado.
 
-        # Next number.
-        number = int(is_optimized)
+    Args:
+        encoded (byte list): número/s codificado/s.
+        is_optimized (bool): indica si al número se le deberá agregar un bit.
+        offset (int): nro. de bit de inicio de lectura.
+
+    Returns:
+        number (int): número decodificado.
+        offset (int): nuevo offset.
+    '''
+    decoded, offset = decode_with_offset(encoded, 1, is_optimized, offset)
+    return decoded[0], offset
+
+
+def decode(encoded, nums, is_optimized, offset=0, prefix_sum=False, base=0):
+    '''Decodifica una secuencia de bytes codificada en unario.
+
+    Args:
+        encoded (byte list): números codificados.
+        nums (int): cantidad de números a decodificar.
+        is_optimized (bool): indica si a los números resultantes se les deberá
+            agregar un bit, consecuencia de una optimización en la codificación.
+        offset (int): nro. de bit de inicio de lectura dentro del array (visto
+            como array de bits).
+        prefix_sum (bool): indica si los números decodificados son gaps, en
+            cuyo caso se retorna su suma acumulada desde base (ver
+            gapsencoder.prefix_sum). Por omisión, en False.
+        base (int): número desde el que se acumulan los gaps.
+
+    Returns:
+        decoded (int list): números decodificados.
+    '''
+    decoded = decode_with_offset(encoded, nums, is_optimized, offset)[0]
 
-        # Actualización bit_index y byte_index
-        bit_index = (bit_index + 1) & 7
-        byte_index += (bit_index == 0)
+    if prefix_sum:
+        return gapsenc.prefix_sum(decoded, base)
 
     return decoded
 
@@ -4,12 +4,31 @@
 - Nombre: vbencoder.py
 - Descripción: permite encode/decode de enteros a/desde Variable Byte.
 - Autor: Agustín González
-- Modificado: 18/04/18
+- Modificado: 16/10/26
 '''
 
 import time
 import math
 
+try:
+    # Relative import.
+    from . import gapsencoder as gapsenc
+    from .bitutils import np_byte_view
+except:
+    # Import para ejecución 'directa' del script.
+    import gapsencoder as gapsenc
+    from bitutils import np_byte_view
+
+try:
+    # NumPy es opcional: permite la decodificación vectorizada (ver decode).
+    import numpy as np
+except ImportError:
+    np = None
+
+# Máximo de bytes por número de la decodificación vectorizada (9 bytes = 63
+# bits de datos, que entran en un entero de 64 bits).
+NP_MAX_BYTES = 9
+
 
 def compute_encoded_size(numbers):
     '''Calcula el tamaño de codificación final de la lista dada.
@@ -59,6 +78,44 @@ def encode(number):
     return encoded
 
 
+def encode_list(numbers):
+    '''Codifica una lista de números a Variable Byte, escribiendo directamente
+    sobre un array de bytes reservado de antemano.
+
+    Args:
+        numbers (int list): números a codificar.
+
+    Returns:
+        encoded (bytearray): números codificados.
+    '''
+    # Bytes requeridos por número (7 bits de datos por byte, mínimo 1).
+    sizes = [(number.bit_length() + 6) // 7 or 1 for number in numbers]
+
+    encoded = bytearray(sum(sizes))
+
+    position = 0
+    for i in range(0, len(numbers)):
+        number = numbers[i]
+
+        # Números de un byte: sólo terminador.
+        if number < 128:
+            encoded[position] = number + 128
+            position += 1
+            continue
+
+        # Escritura desde el último byte (terminador) hacia el primero.
+        size = sizes[i]
+        last = position + size - 1
+        encoded[last] = (number & 127) + 128
+        for j in range(last - 1, position - 1, -1):
+            number >>= 7
+            encoded[j] = number & 127
+
+        position += size
+
+    return encoded
+
+
 def decode_number(encoded, offset=0):
     '''Decodifica un número codificado en Variable Byte desde el offset de la
     secuencia de bytes dada.
@@ -88,29 +145,135 @@ def decode_number(encoded, offset=0):
     return 0, offset
 
 
-def decode(encoded):
-    '''Decodifica una secuencia de bytes codificada en Variable Byte.
+def __np_decode(encoded, nums, offset):
+    '''Decodifica una secuencia de bytes codificada en Variable Byte utilizando
+    NumPy: los terminadores se hallan mediante la comparación '>= 128' y los
+    bytes de todos los números se combinan por posición relativa a su
+    terminador (una operación vectorizada por byte del número más largo).
 
     Args:
         encoded (byte list): números codificados.
+        nums (int): cantidad de números a decodificar (None: todos).
+        offset (int): nro. de bit de inicio de lectura.
+
+    Returns:
+        numbers (ndarray): números decodificados (o None, si algún número
+            excede NP_MAX_BYTES).
+    '''
+    # Vista (sin copia) de los bytes a leer: si se conoce nums, a lo sumo
+    # NP_MAX_BYTES por número (y no el resto del buffer, que puede ser, por
+    # ejemplo, un archivo mapeado en memoria).
+    start = offset >> 3
+    count = len(encoded) - start
+    if nums is not None:
+        count = min(count, nums*NP_MAX_BYTES)
+    data = np_byte_view(encoded, start, count)
+
+    # Índices de los bytes terminadores (último byte de cada número).
+    ends = np.flatnonzero(data >= 128)
+    if nums is not None:
+        # Menos terminadores que números en la ventana leída: algún número
+        # excede NP_MAX_BYTES (o la codificación está incompleta).
+        if len(ends) < nums and count < len(encoded) - start:
+            return None
+        ends = ends[:nums]
+
+    if len(ends) == 0:
+        return np.zeros(0, dtype=np.uint64)
+
+    # Cantidad de bytes de cada número.
+    sizes = np.empty_like(ends)
+    sizes[0] = ends[0] + 1
+    sizes[1:] = ends[1:] - ends[:-1]
+
+    max_size = int(sizes.max())
+    if max_size > NP_MAX_BYTES:
+        return None
+
+    # 7 bits de datos de cada byte, precedidos por max_size bytes en 0 (para
+    # que la lectura de bytes anteriores al primer número no resulte en
+    # índices negativos).
+    data_bits = np.zeros(ends[-1] + 1 + max_size, dtype=np.uint8)
+    data_bits[max_size:] = data[:ends[-1]+1] & 127
+    ends = ends + max_size
+
+    # Combinación por posición relativa al terminador: en la iteración k se
+    # agrega, a todos los números de más de k bytes, el byte k lugares
+    # anterior a su terminador (desplazado 7*k bits). La cantidad de
+    # iteraciones es la del número más largo (y no la de números).
+    numbers = data_bits[ends].astype(np.uint64)
+    for k in range(1, max_size):
+        shifted = data_bits[ends - k].astype(np.uint64)
+        shifted[sizes <= k] = 0
+        numbers |= shifted << np.uint64(7*k)
+
+    return numbers
+
+
+def decode(encoded, nums=None, offset=0, prefix_sum=False, base=0):
+    '''Decodifica una secuencia de bytes codificada en Variable Byte. Si NumPy
+    está instalado, se utiliza una decodificación vectorizada (ver
+    __np_decode), con idéntico resultado.
+
+    Args:
+        encoded (byte list): números codificados.
+        nums (int): cantidad de números a decodificar. Por omisión (None), se
+            lee la totalidad de los bytes.
+        offset (int): nro. de bit de inicio de lectura.
+        prefix_sum (bool): indica si los números decodificados son gaps, en
+            cuyo caso se retorna su suma acumulada desde base (ver
+            gapsencoder.prefix_sum). Por omisión, en False.
+        base (int): número desde el que se acumulan los gaps.
 
     Returns:
         numbers (int list): números decodificados.
     '''
+    if np is not None:
+        numbers = __np_decode(encoded, nums, offset)
+        if numbers is not None:
+            if prefix_sum:
+                return gapsenc.prefix_sum(numbers, base)
+            # Nota: los números son de a lo sumo 63 bits, por lo que la
+            # conversión desde int64 (más rápida que desde uint64) es exacta.
+            return numbers.view(np.int64).tolist()
+
     numbers = []
     number = 0
 
-    for byte in encoded:
-        # number = 128 * number + byte
-        number = (number << 7) + byte
-
-        # Si bit 128 está activo...
-        if byte > 127:
-            # Eliminación de 128 correspondiente a bit más significativo.
-            numbers.append(number-128)
-
-            # Finalización de decode para número actual.
-            number = 0
+    # Vista (sin copia) de los bytes a leer, si encoded implementa el
+    # protocolo buffer.
+    position = offset >> 3
+    try:
+        data = memoryview(encoded)[position:]
+        position = 0
+    except TypeError:
+        data = encoded
+
+    if nums is None:
+        nums = len(data)
+
+    # Lectura por ventanas de tantos bytes como números restantes: dado que
+    # cada número ocupa al menos un byte, ninguna ventana excede los bytes de
+    # los números a decodificar, por lo que no es necesario comprobar la
+    # cantidad de números decodificados por cada byte (ni por cada número).
+    while position < len(data) and len(numbers) < nums:
+        window = data[position:position + nums - len(numbers)]
+        position += len(window)
+
+        for byte in window:
+            # number = 128 * number + byte
+            number = (number << 7) + byte
+
+            # Si bit 128 está activo...
+            if byte > 127:
+                # Eliminación de 128 correspondiente a bit más significativo.
+                numbers.append(number-128)
+
+                # Finalización de decode para número actual.
+                number = 0
+
+    if prefix_sum:
+        return gapsenc.prefix_sum(numbers, base)
 
     return numbers
 
@@ -125,15 +288,13 @@ def main():
     # Encode
     # gaps = gapsencoder.encode(numbers)
     start = time.time()
-    encoded = []
-    for number in numbers:
-        encoded += encode(number)
+    encoded = encode_list(numbers)
     end = time.time()
     encoded_time = end-start
 
     # Decode
     start = time.time()
-    decoded = decode(encoded)
+    decoded = decode(encoded, len(numbers))
     end = time.time()
     decoded_time = end-start
 